@@ -12,6 +12,7 @@ from utils.sqlalchemy import Base
 
 
 from fex_utilities.threads.models import *
+from threads.models import ThreadActivePath  # noqa: F401
 
 
 
@@ -27,10 +28,21 @@ if config.config_file_name is not None:
 target_metadata = [Base.metadata]
 
 
+# Columns maintained by migrations alone, not mapped on the fex_utilities models
+UNMAPPED_COLUMNS = {
+    ("thread", "deleted_at"),  # a9d4e7c2b318, kept by a trigger
+}
+
+
 def include_object(object, name, type_, reflected, compare_to):
     # Keep all tables present in the database
     if type_ == "table" and reflected:
         return False
+    if type_ == "column" and reflected and (object.table.name, name) in UNMAPPED_COLUMNS:
+        return False
+    # Keep indexes created by migrations only (expression, partial and trigram indexes)
+    if type_ == "index" and reflected and compare_to is None:
+        return False
     return True
 
 
@@ -0,0 +1,59 @@
+"""record when a thread was soft-deleted
+
+Revision ID: a9d4e7c2b318
+Revises: e27c9f4a18b3
+Create Date: 2026-10-16 19:40:05.332917
+
+The purge job used updated_at as the deletion time, so any later touch of a deleted thread
+restarted its retention period. thread.deleted_at is set by a trigger whenever is_deleted turns
+true (and cleared when it turns false), whichever code path flips it; the Thread model lives in
+fex_utilities, so the column is not mapped there and threads.dao reads it by name. Threads already
+deleted take their updated_at, the best record of their deletion time available.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4e7c2b318'
+down_revision: Union[str, None] = 'e27c9f4a18b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE thread ADD COLUMN IF NOT EXISTS deleted_at timestamptz")
+    op.execute("""
+        CREATE FUNCTION thread_set_deleted_at() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.is_deleted AND (TG_OP = 'INSERT' OR NOT coalesce(OLD.is_deleted, false)) THEN
+                NEW.deleted_at := now();
+            ELSIF NOT coalesce(NEW.is_deleted, false) THEN
+                NEW.deleted_at := NULL;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("CREATE TRIGGER thread_set_deleted_at BEFORE INSERT OR UPDATE OF is_deleted ON thread "
+               "FOR EACH ROW EXECUTE FUNCTION thread_set_deleted_at()")
+    # Not under the trigger: it only fires on updates of is_deleted
+    op.execute("UPDATE thread SET deleted_at = coalesce(updated_at, now()) WHERE is_deleted AND deleted_at IS NULL")
+
+    with op.get_context().autocommit_block():
+        # ThreadPurgeDao.purge_deleted_threads: soft-deleted threads, oldest deletion first
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_thread_deleted_at ON thread (deleted_at) "
+                   "WHERE is_deleted = true")
+        # Superseded by ix_thread_deleted_at (e27c9f4a18b3)
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_thread_deleted_id")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_thread_deleted_id ON thread (id) WHERE is_deleted = true")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_thread_deleted_at")
+    op.execute("DROP TRIGGER IF EXISTS thread_set_deleted_at ON thread")
+    op.execute("DROP FUNCTION IF EXISTS thread_set_deleted_at()")
+    op.execute("ALTER TABLE thread DROP COLUMN IF EXISTS deleted_at")
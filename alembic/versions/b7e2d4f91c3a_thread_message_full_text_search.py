@@ -0,0 +1,42 @@
+"""thread message full text search indexes
+
+Revision ID: b7e2d4f91c3a
+Revises: 4ea8ddfe0dba
+Create Date: 2026-10-16 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d4f91c3a'
+down_revision: Union[str, None] = '4ea8ddfe0dba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to threads.dao.SEARCH_DOCUMENT_SQL / SEARCH_TEXT_CONFIG or the planner will not use the indexes
+SEARCH_DOCUMENT_SQL = "coalesce(display_text, '') || ' ' || coalesce(content, '')"
+SEARCH_TEXT_CONFIG = "english"
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Build concurrently so the largest table keeps taking writes while the indexes are created
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_thread_message_search_tsv ON thread_message "
+            f"USING gin (to_tsvector('{SEARCH_TEXT_CONFIG}', {SEARCH_DOCUMENT_SQL}))"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_thread_message_search_trgm ON thread_message "
+            f"USING gin (({SEARCH_DOCUMENT_SQL}) gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_thread_message_search_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_thread_message_search_tsv")
@@ -0,0 +1,53 @@
+"""thread active path snapshot table
+
+Revision ID: c41f7a9e2d68
+Revises: b7e2d4f91c3a
+Create Date: 2026-10-16 14:02:17.904512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7a9e2d68'
+down_revision: Union[str, None] = 'b7e2d4f91c3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('thread_active_path',
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('thread_uuid', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('leaf_message_id', sa.Integer(), nullable=False),
+    sa.Column('message_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.ForeignKeyConstraint(['thread_uuid'], ['thread.uuid'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('thread_uuid')
+    )
+    # Snapshot the current path of every live thread; threads missed here are filled in on their next write
+    op.execute("""
+        WITH RECURSIVE active_paths AS (
+            SELECT t.uuid AS thread_uuid, m.id, m.parent_message_id, m.id AS leaf_id, 0 AS depth
+            FROM thread t
+            JOIN thread_message m ON m.id = t.last_message_id AND m.thread_uuid = t.uuid
+            WHERE t.is_deleted IS NOT TRUE
+            UNION ALL
+            SELECT p.thread_uuid, m.id, m.parent_message_id, p.leaf_id, p.depth + 1
+            FROM active_paths p
+            JOIN thread_message m ON m.id = p.parent_message_id AND m.thread_uuid = p.thread_uuid
+            WHERE p.depth < 10000
+        )
+        INSERT INTO thread_active_path (thread_uuid, leaf_message_id, message_ids, created_at, updated_at)
+        SELECT thread_uuid, leaf_id, array_agg(id ORDER BY depth DESC), now(), now()
+        FROM active_paths
+        GROUP BY thread_uuid, leaf_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('thread_active_path')
@@ -0,0 +1,193 @@
+"""hash partition thread_message by thread_uuid
+
+Revision ID: d5a83c1b7e40
+Revises: c41f7a9e2d68
+Create Date: 2026-10-16 15:27:03.551870
+
+Moves thread_message online into a table hash-partitioned on thread_uuid:
+
+1. create thread_message_partitioned (same columns and id sequence) with PARTITION_COUNT partitions
+2. mirror every write on thread_message into it with a trigger
+3. copy the existing rows in id ranges of BACKFILL_BATCH_SIZE, one short transaction each
+4. swap the tables in a single transaction; the old heap is kept as thread_message_unpartitioned
+   for rollback until f8c2d9b04a61 drops it
+
+Foreign keys pointing at thread_message.id (parent_message_id, thread_message_summary) are dropped
+because a key on a partitioned table must include the partition column. Messages without a
+thread_uuid cannot be placed in a partition and are not copied.
+
+The ThreadMessage model comes from fex_utilities (installed from its main branch) and must match
+before this revision is deployed: primary key (id, thread_uuid) with thread_uuid non-nullable, and
+no ForeignKey on ThreadMessage.parent_message_id or ThreadMessageSummary.thread_message_id. The
+upgrade checks the installed models first and refuses to run until they do.
+
+"""
+import time
+from typing import List, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a83c1b7e40'
+down_revision: Union[str, None] = 'c41f7a9e2d68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITION_COUNT = 16
+BACKFILL_BATCH_SIZE = 20000
+# Pause between backfill batches so replicas and autovacuum keep up
+BACKFILL_PAUSE_SECONDS = 0.05
+
+# Must stay identical to threads.dao.SEARCH_DOCUMENT_SQL / SEARCH_TEXT_CONFIG (see b7e2d4f91c3a)
+SEARCH_DOCUMENT_SQL = "coalesce(display_text, '') || ' ' || coalesce(content, '')"
+SEARCH_TEXT_CONFIG = "english"
+
+# Indexes of the old heap, renamed out of the way so the partitioned indexes can take their names
+MOVED_INDEXES = (
+    "thread_message_pkey",
+    "ix_thread_message_thread_uuid",
+    "ix_thread_message_search_tsv",
+    "ix_thread_message_search_trgm",
+)
+
+
+def _get_columns(table_name: str) -> List[str]:
+    result = op.get_bind().execute(sa.text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :table_name ORDER BY ordinal_position"
+    ), {"table_name": table_name})
+    return [row[0] for row in result]
+
+
+def _upsert_sql(target: str, source_select: str, conflict_columns: str, columns: List[str]) -> str:
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+    return f"INSERT INTO {target} {source_select} ON CONFLICT ({conflict_columns}) DO UPDATE SET {updates}"
+
+
+def _check_installed_models():
+    """Fail before touching the database when the installed fex_utilities models predate the partitioning."""
+    from fex_utilities.threads.models import ThreadMessage, ThreadMessageSummary
+
+    message_table = ThreadMessage.__table__
+    mismatches = []
+    if {column.name for column in message_table.primary_key.columns} != {"id", "thread_uuid"}:
+        mismatches.append("ThreadMessage primary key is not (id, thread_uuid)")
+    if message_table.c.thread_uuid.nullable:
+        mismatches.append("ThreadMessage.thread_uuid is nullable")
+    if message_table.c.parent_message_id.foreign_keys:
+        mismatches.append("ThreadMessage.parent_message_id has a ForeignKey")
+    if ThreadMessageSummary.__table__.c.thread_message_id.foreign_keys:
+        mismatches.append("ThreadMessageSummary.thread_message_id has a ForeignKey")
+    if mismatches:
+        raise RuntimeError(
+            "The installed fex_utilities models do not match a partitioned thread_message, upgrade "
+            "fex_utilities before running this revision: " + "; ".join(mismatches)
+        )
+
+
+def upgrade() -> None:
+    _check_installed_models()
+    columns = _get_columns("thread_message")
+
+    op.execute(
+        "CREATE TABLE thread_message_partitioned (LIKE thread_message INCLUDING DEFAULTS) "
+        "PARTITION BY HASH (thread_uuid)"
+    )
+    op.execute("ALTER TABLE thread_message_partitioned ALTER COLUMN thread_uuid SET NOT NULL")
+    for remainder in range(PARTITION_COUNT):
+        op.execute(
+            f"CREATE TABLE thread_message_p{remainder:02d} PARTITION OF thread_message_partitioned "
+            f"FOR VALUES WITH (MODULUS {PARTITION_COUNT}, REMAINDER {remainder})"
+        )
+    # id alone stays indexed (leading column) for lookups by primary key
+    op.execute("ALTER TABLE thread_message_partitioned "
+               "ADD CONSTRAINT thread_message_partitioned_pkey PRIMARY KEY (id, thread_uuid)")
+    op.execute("ALTER TABLE thread_message_partitioned ADD CONSTRAINT thread_message_partitioned_thread_uuid_fkey "
+               "FOREIGN KEY (thread_uuid) REFERENCES thread (uuid)")
+    op.execute("CREATE INDEX ix_thread_message_partitioned_thread_uuid "
+               "ON thread_message_partitioned (thread_uuid, id)")
+    op.execute(
+        "CREATE INDEX ix_thread_message_partitioned_search_tsv ON thread_message_partitioned "
+        f"USING gin (to_tsvector('{SEARCH_TEXT_CONFIG}', {SEARCH_DOCUMENT_SQL}))"
+    )
+    op.execute(
+        "CREATE INDEX ix_thread_message_partitioned_search_trgm ON thread_message_partitioned "
+        f"USING gin (({SEARCH_DOCUMENT_SQL}) gin_trgm_ops)"
+    )
+
+    op.execute(f"""
+        CREATE FUNCTION thread_message_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM thread_message_partitioned
+                WHERE id = OLD.id AND thread_uuid = OLD.thread_uuid
+                  AND (TG_OP = 'DELETE' OR OLD.thread_uuid IS DISTINCT FROM NEW.thread_uuid);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.thread_uuid IS NOT NULL THEN
+                {_upsert_sql("thread_message_partitioned", "SELECT (NEW).*", "id, thread_uuid", columns)};
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("CREATE TRIGGER thread_message_mirror AFTER INSERT OR UPDATE OR DELETE ON thread_message "
+               "FOR EACH ROW EXECUTE FUNCTION thread_message_mirror()")
+
+    # Each batch commits on its own so the copy never holds long locks or a long-running snapshot
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        # Read after the trigger exists: every later row is mirrored, every earlier one is <= max_id
+        max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM thread_message")).scalar()
+        lower_id = 0
+        while lower_id < max_id:
+            bind.execute(sa.text(
+                "INSERT INTO thread_message_partitioned SELECT * FROM thread_message "
+                "WHERE id > :lower_id AND id <= :upper_id AND thread_uuid IS NOT NULL "
+                "ON CONFLICT (id, thread_uuid) DO NOTHING"
+            ), {"lower_id": lower_id, "upper_id": lower_id + BACKFILL_BATCH_SIZE})
+            lower_id += BACKFILL_BATCH_SIZE
+            time.sleep(BACKFILL_PAUSE_SECONDS)
+        bind.execute(sa.text("ANALYZE thread_message_partitioned"))
+
+    # The swap runs in the migration's closing transaction, atomically with the version stamp
+    op.execute("LOCK TABLE thread_message IN ACCESS EXCLUSIVE MODE")
+    op.execute("DROP TRIGGER thread_message_mirror ON thread_message")
+    op.execute("DROP FUNCTION thread_message_mirror()")
+    op.execute("ALTER TABLE thread_message_summary "
+               "DROP CONSTRAINT IF EXISTS thread_message_summary_thread_message_id_fkey")
+    op.execute("ALTER TABLE thread_message DROP CONSTRAINT IF EXISTS thread_message_parent_message_id_fkey")
+    op.execute("ALTER TABLE thread_message RENAME TO thread_message_unpartitioned")
+    for index_name in MOVED_INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {index_name} RENAME TO {index_name}_unpartitioned")
+    op.execute("ALTER TABLE thread_message_partitioned RENAME TO thread_message")
+    op.execute("ALTER TABLE thread_message RENAME CONSTRAINT thread_message_partitioned_pkey TO thread_message_pkey")
+    op.execute("ALTER TABLE thread_message "
+               "RENAME CONSTRAINT thread_message_partitioned_thread_uuid_fkey TO thread_message_thread_uuid_fkey")
+    op.execute("ALTER INDEX ix_thread_message_partitioned_thread_uuid RENAME TO ix_thread_message_thread_uuid")
+    op.execute("ALTER INDEX ix_thread_message_partitioned_search_tsv RENAME TO ix_thread_message_search_tsv")
+    op.execute("ALTER INDEX ix_thread_message_partitioned_search_trgm RENAME TO ix_thread_message_search_trgm")
+    op.execute("ALTER SEQUENCE thread_message_id_seq OWNED BY thread_message.id")
+
+
+def downgrade() -> None:
+    columns = _get_columns("thread_message")
+
+    op.execute("LOCK TABLE thread_message IN ACCESS EXCLUSIVE MODE")
+    # Bring the kept heap up to date with everything written since the swap
+    op.execute(
+        "DELETE FROM thread_message_unpartitioned u "
+        "WHERE NOT EXISTS (SELECT 1 FROM thread_message m WHERE m.id = u.id AND m.thread_uuid = u.thread_uuid) "
+        "AND u.thread_uuid IS NOT NULL"
+    )
+    op.execute(_upsert_sql("thread_message_unpartitioned", "SELECT * FROM thread_message", "id", columns))
+    op.execute("ALTER SEQUENCE thread_message_id_seq OWNED BY thread_message_unpartitioned.id")
+    op.execute("DROP TABLE thread_message")
+    op.execute("ALTER TABLE thread_message_unpartitioned RENAME TO thread_message")
+    for index_name in MOVED_INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {index_name}_unpartitioned RENAME TO {index_name}")
+    op.execute("ALTER TABLE thread_message ADD CONSTRAINT thread_message_parent_message_id_fkey "
+               "FOREIGN KEY (parent_message_id) REFERENCES thread_message (id)")
+    op.execute("ALTER TABLE thread_message_summary ADD CONSTRAINT thread_message_summary_thread_message_id_fkey "
+               "FOREIGN KEY (thread_message_id) REFERENCES thread_message (id)")
@@ -0,0 +1,77 @@
+"""indexes for the hot thread and thread message queries
+
+Revision ID: e27c9f4a18b3
+Revises: d5a83c1b7e40
+Create Date: 2026-10-16 16:48:55.207316
+
+"""
+from typing import List, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e27c9f4a18b3'
+down_revision: Union[str, None] = 'd5a83c1b7e40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, definition) of plain-table indexes, built concurrently
+TABLE_INDEXES = (
+    # ThreadListDao.list_threads_by_activity: live threads of a user, most recently active first
+    ("ix_thread_user_email_product_recency", "thread",
+     "(user_email, product, updated_at DESC, id DESC) WHERE is_deleted = false"),
+    # ThreadPurgeDao.purge_deleted_threads: soft-deleted threads in id order
+    ("ix_thread_deleted_id", "thread", "(id) WHERE is_deleted = true"),
+    # summaries looked up by the message they summarize
+    ("ix_thread_message_summary_thread_message_id", "thread_message_summary", "(thread_message_id)"),
+)
+
+# (name, definition) of thread_message indexes; thread_message is partitioned (d5a83c1b7e40)
+MESSAGE_INDEXES = (
+    # children of a message, e.g. the revisions under a turn
+    ("ix_thread_message_parent_message_id", "(parent_message_id)"),
+    # ConversationPathDao.get_thread_skeleton as an index-only scan; supersedes ix_thread_message_thread_uuid
+    ("ix_thread_message_thread_uuid_id", "(thread_uuid, id) INCLUDE (parent_message_id)"),
+)
+
+
+def _get_partitions(table_name: str) -> List[str]:
+    result = op.get_bind().execute(sa.text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table_name ORDER BY child.relname"
+    ), {"table_name": table_name})
+    return [row[0] for row in result]
+
+
+def _create_partitioned_index(name: str, table_name: str, definition: str):
+    """
+    CREATE INDEX CONCURRENTLY does not work on a partitioned table, so create the parent index
+    ON ONLY (invalid until complete), build each partition's index concurrently and attach it.
+    """
+    op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table_name} {definition}")
+    for partition in _get_partitions(table_name):
+        partition_index = f"{name}_{partition.rsplit('_', 1)[-1]}"
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} {definition}")
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table_name, definition in TABLE_INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table_name} {definition}")
+        for name, definition in MESSAGE_INDEXES:
+            _create_partitioned_index(name, "thread_message", definition)
+        op.execute("DROP INDEX IF EXISTS ix_thread_message_thread_uuid")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        _create_partitioned_index("ix_thread_message_thread_uuid", "thread_message", "(thread_uuid, id)")
+        for name, _ in MESSAGE_INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        for name, _, _ in TABLE_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
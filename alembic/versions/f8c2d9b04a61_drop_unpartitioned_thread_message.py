@@ -0,0 +1,51 @@
+"""drop the unpartitioned thread_message heap kept by d5a83c1b7e40
+
+Revision ID: f8c2d9b04a61
+Revises: a9d4e7c2b318
+Create Date: 2026-10-16 19:12:40.618204
+
+d5a83c1b7e40 keeps the pre-partitioning heap as thread_message_unpartitioned so that revision can
+be rolled back without data loss. Once the partitioned table has been verified in production, run
+this revision to reclaim the space; until then, hold the deploy at a9d4e7c2b318.
+
+Downgrading recreates the heap empty, with the names d5a83c1b7e40's downgrade expects; that
+downgrade then refills it from the partitioned table.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8c2d9b04a61'
+down_revision: Union[str, None] = 'a9d4e7c2b318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to d5a83c1b7e40.SEARCH_DOCUMENT_SQL / SEARCH_TEXT_CONFIG
+SEARCH_DOCUMENT_SQL = "coalesce(display_text, '') || ' ' || coalesce(content, '')"
+SEARCH_TEXT_CONFIG = "english"
+
+
+def upgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS thread_message_unpartitioned")
+
+
+def downgrade() -> None:
+    op.execute("CREATE TABLE thread_message_unpartitioned (LIKE thread_message INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE thread_message_unpartitioned ALTER COLUMN thread_uuid DROP NOT NULL")
+    op.execute("ALTER TABLE thread_message_unpartitioned "
+               "ADD CONSTRAINT thread_message_pkey_unpartitioned PRIMARY KEY (id)")
+    op.execute("ALTER TABLE thread_message_unpartitioned ADD CONSTRAINT thread_message_thread_uuid_fkey "
+               "FOREIGN KEY (thread_uuid) REFERENCES thread (uuid)")
+    op.execute("CREATE INDEX ix_thread_message_thread_uuid_unpartitioned "
+               "ON thread_message_unpartitioned (thread_uuid)")
+    op.execute(
+        "CREATE INDEX ix_thread_message_search_tsv_unpartitioned ON thread_message_unpartitioned "
+        f"USING gin (to_tsvector('{SEARCH_TEXT_CONFIG}', {SEARCH_DOCUMENT_SQL}))"
+    )
+    op.execute(
+        "CREATE INDEX ix_thread_message_search_trgm_unpartitioned ON thread_message_unpartitioned "
+        f"USING gin (({SEARCH_DOCUMENT_SQL}) gin_trgm_ops)"
+    )
@@ -0,0 +1,255 @@
+"""
+Plan regression check for the hot thread queries.
+
+Seeds synthetic threads and messages into a migrated database (`alembic upgrade head`), runs each
+DAO and ThreadService (fex_utilities) method below, captures the statements it sends, exactly as
+compiled by the postgresql dialect, and runs `EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)` on them.
+Exits non-zero when any plan reads thread, thread_message (or one of its partitions),
+thread_message_summary or thread_active_path with a sequential scan, or when a query that has an
+index of its own (e27c9f4a18b3, a9d4e7c2b318) does not use it. Everything runs in one transaction
+that is rolled back, and each call and EXPLAIN in a savepoint of its own, so the database is left
+untouched.
+
+    python -m benchmarks.explain_hot_queries --db-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import timedelta
+
+from fex_utilities.threads.services import ThreadService
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from config.settings import loaded_config
+from threads.dao import ConversationPathDao, ThreadActivePathDao, ThreadListDao, ThreadPurgeDao, ThreadSearchDao
+from utils.connection_handler import ConnectionHandler
+from utils.sqlalchemy import get_current_time
+
+CHECKED_RELATIONS = ("thread", "thread_message", "thread_message_summary", "thread_active_path")
+BENCH_EMAIL_DOMAIN = "explain-check.invalid"
+PRODUCT = "CO_PILOT"
+# Statements the session issues around the queries being checked
+IGNORED_STATEMENT_PREFIXES = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT", "BEGIN", "COMMIT", "ROLLBACK")
+THREAD_RECENCY_INDEX = "ix_thread_user_email_product_recency"
+THREAD_MESSAGE_TREE_INDEX = "ix_thread_message_thread_uuid_id"
+
+
+def thread_service(session) -> ThreadService:
+    return ThreadService(connection_handler=ConnectionHandler(session=session))
+
+
+# name: (call, index the plan must use, or None to only rule out sequential scans).
+# Partitions' copies of an index are named after it (see e27c9f4a18b3) and count as using it.
+HOT_QUERIES = {
+    "ThreadListDao.list_threads_by_activity": (
+        lambda session, sample: ThreadListDao(session).list_threads_by_activity(sample["user_email"], PRODUCT, 20),
+        THREAD_RECENCY_INDEX
+    ),
+    "ThreadListDao.list_threads_by_activity (next page)": (
+        lambda session, sample: ThreadListDao(session).list_threads_by_activity(
+            sample["user_email"], PRODUCT, 20, after=(sample["updated_at"], sample["thread_id"])
+        ),
+        THREAD_RECENCY_INDEX
+    ),
+    "ThreadListDao.get_threads_version": (
+        lambda session, sample: ThreadListDao(session).get_threads_version(sample["user_email"], PRODUCT),
+        None
+    ),
+    "ThreadSearchDao.search_threads": (
+        lambda session, sample: ThreadSearchDao(session).search_threads(
+            sample["search_term"], sample["user_email"], PRODUCT, 10
+        ),
+        None
+    ),
+    "ConversationPathDao.get_thread_skeleton": (
+        lambda session, sample: ConversationPathDao(session).get_thread_skeleton(sample["thread_uuid"]),
+        THREAD_MESSAGE_TREE_INDEX
+    ),
+    "ConversationPathDao.get_active_path": (
+        lambda session, sample: ConversationPathDao(session).get_active_path(sample["thread_uuid"]),
+        None
+    ),
+    "ConversationPathDao.get_active_paths": (
+        lambda session, sample: ConversationPathDao(session).get_active_paths(
+            [sample["last_message_id"]], [sample["thread_uuid"]]
+        ),
+        None
+    ),
+    "ThreadActivePathDao.get_snapshot_path": (
+        lambda session, sample: ThreadActivePathDao(session).get_snapshot_path(sample["thread_uuid"]),
+        None
+    ),
+    "ThreadPurgeDao.purge_deleted_threads": (
+        lambda session, sample: ThreadPurgeDao(session).purge_deleted_threads(
+            get_current_time() - timedelta(days=30), 50
+        ),
+        "ix_thread_deleted_at"
+    ),
+    "ThreadService.list_threads_by_email": (
+        lambda session, sample: thread_service(session).list_threads_by_email(sample["user_email"], product=PRODUCT),
+        None
+    ),
+    "ThreadService.get_threads_with_pagination": (
+        lambda session, sample: thread_service(session).get_threads_with_pagination(
+            query=None, user_email=sample["user_email"], product=PRODUCT, page=1, page_size=20
+        ),
+        None
+    ),
+    "ThreadService.get_thread_messages": (
+        lambda session, sample: thread_service(session).get_thread_messages(thread_id=sample["thread_uuid"]),
+        THREAD_MESSAGE_TREE_INDEX
+    ),
+    "ThreadService.search_thread_by_content": (
+        lambda session, sample: thread_service(session).search_thread_by_content(
+            sample["search_term"], sample["user_email"], PRODUCT
+        ),
+        None
+    ),
+}
+
+
+async def seed(connection, users: int, threads_per_user: int, messages_per_thread: int):
+    await connection.execute(text("""
+        INSERT INTO thread (uuid, title, user_email, product, is_deleted, created_at, updated_at)
+        SELECT md5('explain-check' || n)::uuid, 'thread ' || n,
+               'user' || (n % :users) || '@' || :domain, 'CO_PILOT', n % 10 = 0,
+               now() - (n || ' minutes')::interval, now() - (n || ' minutes')::interval
+        FROM generate_series(1, :threads) AS n
+    """), {"users": users, "threads": users * threads_per_user, "domain": BENCH_EMAIL_DOMAIN})
+    # The deleted_at trigger stamps inserts with now(); age them so the purge has candidates
+    await connection.execute(text("""
+        UPDATE thread SET deleted_at = updated_at - interval '60 days'
+        WHERE is_deleted AND user_email LIKE '%@' || :domain
+    """), {"domain": BENCH_EMAIL_DOMAIN})
+    # One linear conversation per thread; messages of different threads interleave by id
+    await connection.execute(text("""
+        INSERT INTO thread_message (id, thread_uuid, parent_message_id, role, content, display_text,
+                                    is_json, is_disliked, is_deleted, created_at, updated_at)
+        SELECT base.start_id + turn * base.threads + t.n,
+               t.uuid,
+               CASE WHEN turn = 0 THEN NULL ELSE base.start_id + (turn - 1) * base.threads + t.n END,
+               CASE WHEN turn % 2 = 0 THEN 'USER' ELSE 'ASSISTANT' END::role,
+               md5(random()::text), md5(random()::text), false, false, false, now(), now()
+        FROM (SELECT row_number() OVER (ORDER BY id) AS n, uuid FROM thread
+              WHERE user_email LIKE '%@' || :domain) AS t,
+             (SELECT nextval('thread_message_id_seq') AS start_id, count(*) AS threads FROM thread
+              WHERE user_email LIKE '%@' || :domain) AS base,
+             generate_series(0, :messages - 1) AS turn
+    """), {"messages": messages_per_thread, "domain": BENCH_EMAIL_DOMAIN})
+    await connection.execute(text("""
+        UPDATE thread SET last_message_id = leaf.id
+        FROM (SELECT thread_uuid, max(id) AS id FROM thread_message GROUP BY thread_uuid) AS leaf
+        WHERE thread.uuid = leaf.thread_uuid AND thread.user_email LIKE '%@' || :domain
+    """), {"domain": BENCH_EMAIL_DOMAIN})
+    await connection.execute(text("""
+        INSERT INTO thread_active_path (thread_uuid, leaf_message_id, message_ids, created_at, updated_at)
+        SELECT thread_uuid, max(id), array_agg(id ORDER BY id), now(), now() FROM thread_message
+        WHERE thread_uuid IN (SELECT uuid FROM thread WHERE user_email LIKE '%@' || :domain)
+        GROUP BY thread_uuid
+    """), {"domain": BENCH_EMAIL_DOMAIN})
+    for table_name in CHECKED_RELATIONS:
+        await connection.execute(text(f"ANALYZE {table_name}"))
+
+
+def find_seq_scans(plan: dict):
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name", "").startswith(CHECKED_RELATIONS):
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from find_seq_scans(child)
+
+
+def find_index_names(plan: dict):
+    if "Index Name" in plan:
+        yield plan["Index Name"]
+    for child in plan.get("Plans", []):
+        yield from find_index_names(child)
+
+
+async def capture_statements(connection, query) -> list:
+    """Run a DAO call in a savepoint that is rolled back, returning the (statement, parameters) it sent."""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(IGNORED_STATEMENT_PREFIXES):
+            captured.append((statement, parameters))
+
+    savepoint = await connection.begin_nested()
+    event.listen(connection.sync_connection, "before_cursor_execute", record)
+    try:
+        await query(AsyncSession(bind=connection))
+    finally:
+        event.remove(connection.sync_connection, "before_cursor_execute", record)
+        await savepoint.rollback()
+    return captured
+
+
+async def explain(connection, statement: str, parameters) -> dict:
+    # Statements that write (the purge) are analyzed for real, so undo them as well
+    savepoint = await connection.begin_nested()
+    try:
+        result = await connection.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters)
+        explained = result.scalar()
+    finally:
+        await savepoint.rollback()
+    return (json.loads(explained) if isinstance(explained, str) else explained)[0]
+
+
+async def main(args) -> int:
+    engine = create_async_engine(args.db_url)
+    failures = []
+    try:
+        async with engine.connect() as connection:
+            transaction = await connection.begin()
+            try:
+                await seed(connection, args.users, args.threads_per_user, args.messages_per_thread)
+                sample = (await connection.execute(text(
+                    "SELECT t.id AS thread_id, t.user_email, t.uuid AS thread_uuid, t.last_message_id, t.updated_at, "
+                    "substr(m.display_text, 3, 6) AS search_term FROM thread t "
+                    "JOIN thread_message m ON m.thread_uuid = t.uuid AND m.id = t.last_message_id "
+                    "WHERE t.user_email LIKE '%@' || :domain AND t.is_deleted = false LIMIT 1"
+                ), {"domain": BENCH_EMAIL_DOMAIN})).one()._asdict()
+
+                for name, (query, expected_index) in HOT_QUERIES.items():
+                    statements = await capture_statements(connection, lambda session: query(session, sample))
+                    plans = []
+                    for number, (statement, parameters) in enumerate(statements, start=1):
+                        label = name if len(statements) == 1 else f"{name} #{number}"
+                        plan = await explain(connection, statement, parameters)
+                        plans.append(plan)
+                        seq_scans = sorted(set(find_seq_scans(plan["Plan"])))
+                        status = "FAIL" if seq_scans else "ok"
+                        print(f"[{status}] {label}: {plan['Execution Time']:.2f}ms"
+                              + (f", seq scan on {', '.join(seq_scans)}" if seq_scans else ""))
+                        if seq_scans:
+                            failures.append(label)
+                        if args.verbose or seq_scans:
+                            print(statement)
+                            print(json.dumps(plan["Plan"], indent=2))
+                    # Any of the statements a call sends may be the one its index serves
+                    used_indexes = {index_name for plan in plans for index_name in find_index_names(plan["Plan"])}
+                    if expected_index and not any(index_name.startswith(expected_index) for index_name in used_indexes):
+                        print(f"[FAIL] {name}: does not use {expected_index}"
+                              f" (uses {', '.join(sorted(used_indexes)) or 'no index'})")
+                        failures.append(name)
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+    if failures:
+        print(f"\n{len(failures)} hot quer{'y' if len(failures) == 1 else 'ies'} fell back to a sequential scan "
+              f"or missed their index")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=loaded_config.db_url)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads-per-user", type=int, default=100)
+    parser.add_argument("--messages-per-thread", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not only failing ones")
+    sys.exit(asyncio.run(main(parser.parse_known_args()[0])))
@@ -0,0 +1,136 @@
+"""
+Per-thread fetch latency of thread_message as a single heap vs hash-partitioned on thread_uuid.
+
+Seeds the same synthetic dataset into two scratch tables in a throwaway schema, one laid out like
+thread_message before migration d5a83c1b7e40 and one like after it, then times the conversation
+fetch (`WHERE thread_uuid = :thread_uuid ORDER BY id`) for randomly chosen threads on each.
+
+    python -m benchmarks.thread_message_partitioning --threads 20000 --messages-per-thread 50
+
+Uses the configured primary unless --db-url is given. The schema is dropped afterwards unless --keep.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config.settings import loaded_config
+
+SCHEMA = "thread_message_bench"
+COLUMNS_SQL = """
+    id bigint NOT NULL,
+    thread_uuid uuid NOT NULL,
+    parent_message_id bigint,
+    role text,
+    content text,
+    display_text text,
+    created_at timestamptz DEFAULT now()
+"""
+FETCH_SQL = "SELECT id, parent_message_id, role, content, display_text FROM {table} " \
+            "WHERE thread_uuid = :thread_uuid ORDER BY id"
+
+
+async def setup_tables(connection, partitions: int):
+    await connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    await connection.execute(text(f"CREATE TABLE {SCHEMA}.heap ({COLUMNS_SQL}, PRIMARY KEY (id))"))
+    await connection.execute(text(f"CREATE INDEX ON {SCHEMA}.heap (thread_uuid)"))
+    await connection.execute(text(
+        f"CREATE TABLE {SCHEMA}.hashed ({COLUMNS_SQL}, PRIMARY KEY (id, thread_uuid)) PARTITION BY HASH (thread_uuid)"
+    ))
+    for remainder in range(partitions):
+        await connection.execute(text(
+            f"CREATE TABLE {SCHEMA}.hashed_p{remainder:02d} PARTITION OF {SCHEMA}.hashed "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        ))
+    await connection.execute(text(f"CREATE INDEX ON {SCHEMA}.hashed (thread_uuid, id)"))
+
+
+async def seed(connection, threads: int, messages_per_thread: int):
+    # Messages of a thread are interleaved with every other thread's, as with real chat traffic
+    await connection.execute(text(f"""
+        INSERT INTO {SCHEMA}.heap (id, thread_uuid, parent_message_id, role, content, display_text)
+        SELECT turn * :threads + thread_no,
+               md5(thread_no::text)::uuid,
+               CASE WHEN turn = 0 THEN NULL ELSE (turn - 1) * :threads + thread_no END,
+               CASE WHEN turn % 2 = 0 THEN 'USER' ELSE 'ASSISTANT' END,
+               repeat(md5(random()::text), 8),
+               md5(random()::text)
+        FROM generate_series(0, :messages - 1) AS turn, generate_series(1, :threads) AS thread_no
+    """), {"threads": threads, "messages": messages_per_thread})
+    await connection.execute(text(f"INSERT INTO {SCHEMA}.hashed SELECT * FROM {SCHEMA}.heap"))
+    await connection.execute(text(f"ANALYZE {SCHEMA}.heap"))
+    await connection.execute(text(f"ANALYZE {SCHEMA}.hashed"))
+
+
+async def time_fetches(connection, table: str, thread_ids, rounds: int):
+    query = text(FETCH_SQL.format(table=f"{SCHEMA}.{table}"))
+    # Warm the cache and plan once so both layouts are measured hot
+    for thread_id in thread_ids[:50]:
+        await connection.execute(query, {"thread_uuid": thread_id})
+
+    latencies = []
+    for _ in range(rounds):
+        for thread_id in thread_ids:
+            started_at = time.perf_counter()
+            (await connection.execute(query, {"thread_uuid": thread_id})).all()
+            latencies.append((time.perf_counter() - started_at) * 1000)
+    return latencies
+
+
+async def explain(connection, table: str, thread_id) -> str:
+    result = await connection.execute(
+        text("EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) " + FETCH_SQL.format(table=f"{SCHEMA}.{table}")),
+        {"thread_uuid": thread_id}
+    )
+    return "\n".join(row[0] for row in result)
+
+
+def report(name: str, latencies):
+    ordered = sorted(latencies)
+    percentile = lambda fraction: ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]  # noqa: E731
+    print(f"{name:>8}: n={len(ordered)} mean={statistics.mean(ordered):.3f}ms p50={percentile(0.5):.3f}ms "
+          f"p95={percentile(0.95):.3f}ms p99={percentile(0.99):.3f}ms")
+
+
+async def main(args):
+    engine = create_async_engine(args.db_url)
+    try:
+        async with engine.begin() as connection:
+            print(f"Seeding {args.threads} threads x {args.messages_per_thread} messages...")
+            await setup_tables(connection, args.partitions)
+            await seed(connection, args.threads, args.messages_per_thread)
+
+        async with engine.connect() as connection:
+            result = await connection.execute(text(
+                f"SELECT thread_uuid FROM (SELECT DISTINCT thread_uuid FROM {SCHEMA}.heap) AS threads "
+                "ORDER BY random() LIMIT :sample"
+            ), {"sample": args.sample})
+            sample = [row[0] for row in result]
+
+            heap = await time_fetches(connection, "heap", sample, args.rounds)
+            hashed = await time_fetches(connection, "hashed", sample, args.rounds)
+            report("heap", heap)
+            report("hashed", hashed)
+            print("\nheap plan:\n" + await explain(connection, "heap", sample[0]))
+            print("\nhashed plan:\n" + await explain(connection, "hashed", sample[0]))
+    finally:
+        if not args.keep:
+            async with engine.begin() as connection:
+                await connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=loaded_config.db_url)
+    parser.add_argument("--threads", type=int, default=20000)
+    parser.add_argument("--messages-per-thread", type=int, default=50)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--sample", type=int, default=500, help="number of threads fetched per round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded schema for manual inspection")
+    asyncio.run(main(parser.parse_known_args()[0]))
@@ -21,6 +21,9 @@ parser.add('--realm', help='realm')
 # debug flag
 parser.add('--debug', help='debug', action="store_true")
 parser.add('--postgres_fynix_almanac_read_write', help='postgres_fynix_almanac_read_write')
+parser.add('--postgres_fynix_almanac_read_only', help='postgres_fynix_almanac_read_only (read replica)', default="")
+parser.add('--read_replica_max_lag_seconds', help='read_replica_max_lag_seconds', default=5)
+parser.add('--read_replica_health_check_interval', help='read_replica_health_check_interval in seconds', default=10)
 
 parser.add('--azure_openai_key', help='azure_openai_key')
 parser.add('--azure_openai_endpoint', help='azure_openai_endpoint')
@@ -75,6 +78,46 @@ parser.add('--kafka_broker_list', help='KAFKA_BROKER_LIST')
 parser.add('--bing_search_api_key', help='bing_search_api_key')
 parser.add('--bing_search_endpoint', help='bing_search_endpoint')
 parser.add('--elastic_search_url', help='ElasticSearch URL')
+parser.add('--elastic_delete_slices', help='parallel slices of delete-by-query, a number or auto', default='auto')
+parser.add('--elastic_page_size', help='hits fetched per page when iterating documents', default=1000)
+parser.add('--elastic_pit_keep_alive', help='how long a point in time is kept between pages', default='1m')
+
+# embedding client
+parser.add('--embedding_max_concurrency', help='embedding requests in flight per generator', default=8)
+parser.add('--embedding_request_timeout', help='embedding_request_timeout in seconds', default=30)
+parser.add('--embedding_connect_timeout', help='embedding_connect_timeout in seconds', default=5)
+parser.add('--embedding_max_retries', help='embedding_max_retries', default=2)
+
+# embedding chunking
+parser.add('--embedding_chunk_overlap', help='tokens shared by consecutive chunks', default=0)
+parser.add('--embedding_chunking_workers', help='processes tokenizing large documents', default=2)
+parser.add('--embedding_parallel_chunking_min_chars', help='document size from which chunking is parallel',
+           default=500000)
+
+# embedding cache
+parser.add('--embedding_cache_enabled', help='embedding_cache_enabled', default=True)
+parser.add('--embedding_cache_max_entries', help='embeddings kept in memory', default=10000)
+parser.add('--embedding_cache_path', help='SQLite file of the persistent embedding cache',
+           default='.cache/embeddings.sqlite3')
+parser.add('--embedding_cache_max_disk_entries', help='embeddings kept in the SQLite file', default=200000)
+
+# folder tree cache
+parser.add('--folder_tree_cache_enabled', help='folder_tree_cache_enabled', default=True)
+parser.add('--folder_tree_cache_max_graphs', help='graphs whose folder tree is kept in memory', default=256)
+parser.add('--folder_tree_cache_ttl', help='folder_tree_cache_ttl in seconds', default=300)
+
+# thread conversation path cache
+parser.add('--thread_path_cache_enabled', help='thread_path_cache_enabled', default=True)
+parser.add('--thread_path_cache_max_messages', help='thread_path_cache_max_messages', default=50000)
+parser.add('--thread_path_cache_ttl', help='thread_path_cache_ttl in seconds', default=300)
+
+# purge of soft-deleted threads
+parser.add('--thread_purge_enabled', help='thread_purge_enabled', default=True)
+parser.add('--thread_purge_retention_days', help='days a soft-deleted thread is kept before purge', default=30)
+parser.add('--thread_purge_interval_seconds', help='thread_purge_interval_seconds', default=600)
+parser.add('--thread_purge_batch_size', help='threads deleted per purge transaction', default=50)
+parser.add('--thread_purge_max_batches_per_run', help='thread_purge_max_batches_per_run', default=200)
+parser.add('--thread_purge_batch_pause_seconds', help='pause between purge batches in seconds', default=0.5)
 
 arguments = sys.argv
 print(arguments)
@@ -1,13 +1,14 @@
 import enum
 import os
 
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pydantic import BaseSettings
 
 from config.config_parser import docker_args
 from utils.aiohttprequest import AioHttpRequest
 from utils.connection_manager import ConnectionManager
 from utils.sqlalchemy import async_db_url
-from typing import ClassVar, Optional, Dict
+from typing import ClassVar, Optional, Dict, Union
 
 args = docker_args
 
@@ -34,6 +35,11 @@ class Settings(BaseSettings):
     mode: str = args.mode
     postgres_fynix_almanac_read_write: str = args.postgres_fynix_almanac_read_write
     db_url: str = async_db_url(args.postgres_fynix_almanac_read_write)
+    postgres_fynix_almanac_read_only: Optional[str] = args.postgres_fynix_almanac_read_only
+    read_db_url: Optional[str] = (async_db_url(args.postgres_fynix_almanac_read_only)
+                                  if args.postgres_fynix_almanac_read_only else None)
+    read_replica_max_lag_seconds: float = args.read_replica_max_lag_seconds
+    read_replica_health_check_interval: float = args.read_replica_health_check_interval
     db_echo: bool = args.debug
     server_type: str = args.server_type
     BASE_DIR: ClassVar[str] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -47,11 +53,38 @@ class Settings(BaseSettings):
     # realm: str = args.realm
     log_level: str = LogLevel.INFO.value
     elastic_search_url: str = args.elastic_search_url
+    elastic_delete_slices: Union[int, str] = args.elastic_delete_slices
+    elastic_page_size: int = args.elastic_page_size
+    elastic_pit_keep_alive: str = args.elastic_pit_keep_alive
+    embedding_max_concurrency: int = args.embedding_max_concurrency
+    embedding_request_timeout: float = args.embedding_request_timeout
+    embedding_connect_timeout: float = args.embedding_connect_timeout
+    embedding_max_retries: int = args.embedding_max_retries
+    embedding_chunk_overlap: int = args.embedding_chunk_overlap
+    embedding_chunking_workers: int = args.embedding_chunking_workers
+    embedding_parallel_chunking_min_chars: int = args.embedding_parallel_chunking_min_chars
+    embedding_cache_enabled: bool = args.embedding_cache_enabled
+    embedding_cache_max_entries: int = args.embedding_cache_max_entries
+    embedding_cache_path: str = args.embedding_cache_path
+    embedding_cache_max_disk_entries: int = args.embedding_cache_max_disk_entries
+    folder_tree_cache_enabled: bool = args.folder_tree_cache_enabled
+    folder_tree_cache_max_graphs: int = args.folder_tree_cache_max_graphs
+    folder_tree_cache_ttl: int = args.folder_tree_cache_ttl
+    thread_path_cache_enabled: bool = args.thread_path_cache_enabled
+    thread_path_cache_max_messages: int = args.thread_path_cache_max_messages
+    thread_path_cache_ttl: int = args.thread_path_cache_ttl
+    thread_purge_enabled: bool = args.thread_purge_enabled
+    thread_purge_retention_days: int = args.thread_purge_retention_days
+    thread_purge_interval_seconds: int = args.thread_purge_interval_seconds
+    thread_purge_batch_size: int = args.thread_purge_batch_size
+    thread_purge_max_batches_per_run: int = args.thread_purge_max_batches_per_run
+    thread_purge_batch_pause_seconds: float = args.thread_purge_batch_pause_seconds
 
     """ global class instances """
     connection_manager: Optional[ConnectionManager] = None
     read_connection_manager: Optional[ConnectionManager] = None
     aiohttp_request: Optional[AioHttpRequest] = None
+    aps_scheduler: Optional[AsyncIOScheduler] = None
     model_mappings: Optional[Dict] = {}
     embedding_mappings: Optional[Dict] = {}
     kafka_bootstrap_servers: str = args.kafka_broker_list
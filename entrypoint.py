@@ -9,7 +9,9 @@ elif loaded_config.mode == "consumer":
     import asyncio
     from utils.kafka.consumer.consumer import main as consumer_main
 
-    print("Starting Consumer")
-    asyncio.run(consumer_main())
+    # The embedding process pool spawns workers that re-import this module, they must not start a consumer
+    if __name__ == "__main__":
+        print("Starting Consumer")
+        asyncio.run(consumer_main())
 else:
     print('MODE not available')
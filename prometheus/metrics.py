@@ -8,6 +8,79 @@ buckets = [0.1, 0.25, 0.5, 0.75, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12.5, 15, 20, 25
 # if 'prometheus_multiproc_dir' in os.environ or 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
 #     multiprocess.MultiProcessCollector(REGISTRY)  # Add this line to enable multiprocess support
 
+# Thread conversation path cache metrics
+THREAD_PATH_CACHE_HITS = Counter(
+    'thread_path_cache_hits_total',
+    'Number of conversation path lookups served from the in-process cache',
+    registry=REGISTRY
+)
+
+THREAD_PATH_CACHE_MISSES = Counter(
+    'thread_path_cache_misses_total',
+    'Number of conversation path lookups that missed the in-process cache',
+    registry=REGISTRY
+)
+
+THREAD_PATH_CACHE_EVICTIONS = Counter(
+    'thread_path_cache_evictions_total',
+    'Number of conversation paths evicted from the in-process cache to stay within its bound',
+    registry=REGISTRY
+)
+
+READ_REPLICA_FALLBACKS = Counter(
+    'read_replica_fallbacks_total',
+    'Number of read connections routed to the primary because the read replica was down or lagging',
+    registry=REGISTRY
+)
+
+# Embedding cache metrics
+EMBEDDING_CACHE_HITS = Counter(
+    'embedding_cache_hits_total',
+    'Number of embeddings served from the cache instead of the provider, by tier',
+    ['tier'],
+    registry=REGISTRY
+)
+
+EMBEDDING_CACHE_MISSES = Counter(
+    'embedding_cache_misses_total',
+    'Number of embedding lookups that had to call the provider',
+    registry=REGISTRY
+)
+
+# Folder tree cache metrics
+FOLDER_TREE_CACHE_HITS = Counter(
+    'folder_tree_cache_hits_total',
+    'Number of folder structure requests served from a cached snapshot',
+    registry=REGISTRY
+)
+
+FOLDER_TREE_CACHE_MISSES = Counter(
+    'folder_tree_cache_misses_total',
+    'Number of folder structure requests that had to load the graph\'s file paths',
+    registry=REGISTRY
+)
+
+# Soft-deleted thread purge job metrics
+THREAD_PURGE_DELETED_ROWS = Counter(
+    'thread_purge_deleted_rows_total',
+    'Number of rows hard-deleted by the soft-deleted thread purge job',
+    ['table'],
+    registry=REGISTRY
+)
+
+THREAD_PURGE_BATCHES = Counter(
+    'thread_purge_batches_total',
+    'Number of purge batches run, by outcome',
+    ['status'],
+    registry=REGISTRY
+)
+
+THREAD_PURGE_LAST_SUCCESS = Gauge(
+    'thread_purge_last_success_timestamp_seconds',
+    'Unix time the purge job last finished a run without errors',
+    registry=REGISTRY
+)
+
 # API Request Metrics
 API_REQUEST_LATENCY = Histogram(
     'cerebrum_http_request_received_duration_seconds',
@@ -0,0 +1,113 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from config.settings import loaded_config
+from prometheus.metrics import THREAD_PATH_CACHE_HITS, THREAD_PATH_CACHE_MISSES, THREAD_PATH_CACHE_EVICTIONS
+from threads.records import ThreadMessageRecord
+
+CacheKey = Tuple[str, Optional[int]]
+ThreadVersion = Tuple[Optional[int], Any]
+
+
+def thread_version(thread) -> ThreadVersion:
+    """
+    Version of a thread's conversation: appending a message moves last_message_id and every write
+    path bumps updated_at, so any change visible in a conversation changes the version.
+    """
+    return thread.last_message_id, thread.updated_at
+
+
+class ConversationPathCache:
+    """
+    In-process LRU cache of resolved conversation paths keyed by (thread uuid, leaf message id).
+
+    Only explicit leaves are cached: the path to a given leaf does not change when messages are
+    appended, whereas "the thread's current path" would go stale in every worker but the one that
+    handled the write. Callers resolve the leaf from the thread row first. Every entry records the
+    `thread_version` it was resolved at and is only served for that same version, so an edit handled
+    by another worker (which bumps the thread's updated_at) is never answered from this worker's
+    copy; without a version the cache is bypassed. Memory is bounded by the total number of cached
+    messages, and entries expire after `ttl` seconds. Write paths call `invalidate_thread` after
+    committing to free the entries of the old version right away.
+    """
+
+    def __init__(self, max_messages: int, ttl: int, enabled: bool = True):
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[CacheKey, Tuple[float, ThreadVersion, List[ThreadMessageRecord]]]" = OrderedDict()
+        self._thread_keys: Dict[str, Set[CacheKey]] = {}
+        self._size = 0
+
+    def get(self, thread_id: UUID, leaf_message_id: Optional[int],
+            version: Optional[ThreadVersion]) -> Optional[List[ThreadMessageRecord]]:
+        if not self.enabled:
+            return None
+        if leaf_message_id is None or version is None:
+            THREAD_PATH_CACHE_MISSES.inc()
+            return None
+
+        key = (str(thread_id), leaf_message_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic() or entry[1] != version:
+            if entry is not None:
+                self._remove(key)
+            THREAD_PATH_CACHE_MISSES.inc()
+            return None
+
+        self._entries.move_to_end(key)
+        THREAD_PATH_CACHE_HITS.inc()
+        # Hand out a copy so callers cannot reorder or truncate the cached path
+        return list(entry[2])
+
+    def set(self, thread_id: UUID, leaf_message_id: Optional[int], messages: List[ThreadMessageRecord],
+            version: Optional[ThreadVersion]):
+        if not self.enabled or version is None or not messages or len(messages) > self.max_messages:
+            return
+
+        thread_key = str(thread_id)
+        keys = {(thread_key, messages[-1].id)}
+        if leaf_message_id is not None:
+            keys.add((thread_key, leaf_message_id))
+        entry = (time.monotonic() + self.ttl, version, list(messages))
+        for key in keys:
+            self._remove(key)
+            self._entries[key] = entry
+            self._thread_keys.setdefault(thread_key, set()).add(key)
+            self._size += len(messages)
+
+        while self._size > self.max_messages:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            THREAD_PATH_CACHE_EVICTIONS.inc()
+
+    def invalidate_thread(self, thread_id: UUID):
+        for key in self._thread_keys.pop(str(thread_id), set()):
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= len(entry[2])
+
+    def clear(self):
+        self._entries.clear()
+        self._thread_keys.clear()
+        self._size = 0
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= len(entry[2])
+        thread_keys = self._thread_keys.get(key[0])
+        if thread_keys is not None:
+            thread_keys.discard(key)
+            if not thread_keys:
+                del self._thread_keys[key[0]]
+
+
+conversation_path_cache = ConversationPathCache(
+    max_messages=loaded_config.thread_path_cache_max_messages,
+    ttl=loaded_config.thread_path_cache_ttl,
+    enabled=loaded_config.thread_path_cache_enabled
+)
@@ -0,0 +1,451 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from fex_utilities.threads.models import Thread, ThreadMessage, ThreadMessageSummary
+from sqlalchemy import DateTime, and_, any_, bindparam, delete, func, literal, literal_column, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from threads.models import ThreadActivePath
+from threads.records import ThreadMessageRecord
+from utils.dao import BaseDao
+from utils.sqlalchemy import get_current_time
+
+# Identity map kind under which a request's loaded Thread rows are remembered on the ConnectionHandler
+THREAD_IDENTITY = "thread"
+
+# Upper bound on the ancestor walk so a corrupted (cyclic) parent chain cannot recurse forever
+MAX_CONVERSATION_DEPTH = 10000
+
+# Soft-delete time of a thread, kept by a trigger (a9d4e7c2b318); not mapped on the fex_utilities Thread model
+THREAD_DELETED_AT = literal_column("thread.deleted_at", DateTime(timezone=True))
+
+# Searchable text of a message. Must stay identical to the expression indexed by the
+# full text search migration (b7e2d4f91c3a), and is inlined rather than bound so generic plans still match it
+SEARCH_TEXT_CONFIG = "english"
+SEARCH_DOCUMENT_SQL = "coalesce(thread_message.display_text, '') || ' ' || coalesce(thread_message.content, '')"
+
+# Only the columns a conversation needs, so reads skip ORM identity-map bookkeeping
+THREAD_MESSAGE_RECORD_COLUMNS = tuple(getattr(ThreadMessage, field) for field in ThreadMessageRecord.__slots__)
+
+
+class ConversationPathDao(BaseDao):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session=session, db_model=ThreadMessage)
+
+    async def get_active_path(self, thread_id: UUID, leaf_message_id: Optional[int] = None,
+                              limit: Optional[int] = None) -> List[ThreadMessageRecord]:
+        """
+        Fetch the root-to-leaf chain of messages ending at `leaf_message_id` in one round trip.
+
+        When no leaf is given the thread's `last_message_id` is resolved inside the same query.
+        With `limit` only the last `limit` messages of the chain (the leaf and its nearest
+        ancestors) are walked and returned. Messages are returned root first; an empty list means
+        the leaf could not be resolved.
+        """
+        max_depth = min(limit, MAX_CONVERSATION_DEPTH) - 1 if limit else MAX_CONVERSATION_DEPTH
+        if leaf_message_id:
+            leaf_id = literal(leaf_message_id)
+        else:
+            leaf_id = select(Thread.last_message_id).where(Thread.uuid == thread_id).scalar_subquery()
+
+        anchor = (
+            select(ThreadMessage.id, ThreadMessage.parent_message_id, literal(0).label("depth"))
+            .where(ThreadMessage.thread_uuid == thread_id, ThreadMessage.id == leaf_id)
+            .cte("active_path", recursive=True)
+        )
+        parent = aliased(ThreadMessage)
+        active_path = anchor.union_all(
+            select(parent.id, parent.parent_message_id, (anchor.c.depth + 1).label("depth"))
+            .where(
+                parent.id == anchor.c.parent_message_id,
+                parent.thread_uuid == thread_id,
+                anchor.c.depth < max_depth
+            )
+        )
+        query = (
+            select(*THREAD_MESSAGE_RECORD_COLUMNS)
+            .join(active_path, ThreadMessage.id == active_path.c.id)
+            .order_by(active_path.c.depth.desc())
+        )
+        result = await self._execute_query(query)
+        return [ThreadMessageRecord.from_row(row) for row in result]
+
+    async def get_active_paths(self, leaf_message_ids: Iterable[int], thread_ids: Iterable[UUID]) -> List[tuple]:
+        """
+        Fetch the root-to-leaf chains for many leaves in one round trip.
+
+        `thread_ids` are the threads the leaves belong to; filtering on them keeps the anchor scan to
+        those threads' partitions. Returns rows of the record columns plus `thread_uuid` and `leaf_id`,
+        grouped by leaf and ordered root first within each leaf.
+        """
+        anchor = (
+            select(
+                ThreadMessage.id,
+                ThreadMessage.parent_message_id,
+                ThreadMessage.thread_uuid,
+                ThreadMessage.id.label("leaf_id"),
+                literal(0).label("depth")
+            )
+            .where(ThreadMessage.id.in_(list(leaf_message_ids)), ThreadMessage.thread_uuid.in_(list(thread_ids)))
+            .cte("active_paths", recursive=True)
+        )
+        parent = aliased(ThreadMessage)
+        active_paths = anchor.union_all(
+            select(
+                parent.id,
+                parent.parent_message_id,
+                parent.thread_uuid,
+                anchor.c.leaf_id,
+                (anchor.c.depth + 1).label("depth")
+            )
+            .where(
+                parent.id == anchor.c.parent_message_id,
+                parent.thread_uuid == anchor.c.thread_uuid,
+                anchor.c.depth < MAX_CONVERSATION_DEPTH
+            )
+        )
+        query = (
+            select(*THREAD_MESSAGE_RECORD_COLUMNS, ThreadMessage.thread_uuid, active_paths.c.leaf_id)
+            .join(active_paths, ThreadMessage.id == active_paths.c.id)
+            .order_by(active_paths.c.leaf_id, active_paths.c.depth.desc())
+        )
+        result = await self._execute_query(query)
+        return result.all()
+
+    async def get_messages_for_threads(self, thread_ids: Iterable[UUID]) -> List[tuple]:
+        query = (
+            select(*THREAD_MESSAGE_RECORD_COLUMNS, ThreadMessage.thread_uuid)
+            .where(ThreadMessage.thread_uuid.in_(list(thread_ids)))
+            .order_by(ThreadMessage.id)
+        )
+        result = await self._execute_query(query)
+        return result.all()
+
+    async def get_thread_skeleton(self, thread_id: UUID) -> List[tuple]:
+        """(id, parent_message_id) of every message of a thread, enough to build its tree without content."""
+        query = (
+            select(ThreadMessage.id, ThreadMessage.parent_message_id)
+            .where(ThreadMessage.thread_uuid == thread_id)
+            .order_by(ThreadMessage.id)
+        )
+        result = await self._execute_query(query)
+        return result.all()
+
+    async def get_records_by_ids(self, thread_id: UUID, message_ids: List[int]) -> List[ThreadMessageRecord]:
+        query = select(*THREAD_MESSAGE_RECORD_COLUMNS).where(
+            ThreadMessage.thread_uuid == thread_id,
+            ThreadMessage.id.in_(message_ids)
+        )
+        result = await self._execute_query(query)
+        return [ThreadMessageRecord.from_row(row) for row in result]
+
+    async def get_threads_by_uuids(self, thread_ids: Iterable[UUID]) -> List[Thread]:
+        result = await self._execute_query(select(Thread).where(Thread.uuid.in_(list(thread_ids))))
+        return result.scalars().all()
+
+    async def get_thread_versions(self, thread_ids: Iterable[UUID]) -> Dict[str, tuple]:
+        """(last_message_id, updated_at) of each thread by uuid string, the parts of threads.cache.thread_version."""
+        query = select(Thread.uuid, Thread.last_message_id, Thread.updated_at).where(Thread.uuid.in_(list(thread_ids)))
+        result = await self._execute_query(query)
+        return {str(row.uuid): (row.last_message_id, row.updated_at) for row in result}
+
+
+class ThreadActivePathDao(BaseDao):
+    """Reads and maintains the thread_active_path snapshot inside the caller's transaction."""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session=session, db_model=ThreadActivePath)
+
+    async def get_snapshot_path(self, thread_id: UUID, leaf_message_id: Optional[int] = None,
+                                limit: Optional[int] = None) -> List[ThreadMessageRecord]:
+        """
+        Messages of the snapshotted path in one indexed lookup, root first.
+
+        The snapshot is only used when it ends at the requested leaf (the thread's last_message_id
+        when none is given); any other leaf, or a stale snapshot, returns an empty list.
+        """
+        if leaf_message_id:
+            leaf_id = literal(leaf_message_id)
+        else:
+            leaf_id = select(Thread.last_message_id).where(Thread.uuid == thread_id).scalar_subquery()
+        position = func.array_position(ThreadActivePath.message_ids, ThreadMessage.id)
+
+        query = (
+            select(*THREAD_MESSAGE_RECORD_COLUMNS)
+            .join(ThreadActivePath, and_(
+                ThreadActivePath.thread_uuid == ThreadMessage.thread_uuid,
+                ThreadMessage.id == any_(ThreadActivePath.message_ids)
+            ))
+            .where(
+                ThreadActivePath.thread_uuid == thread_id,
+                ThreadActivePath.leaf_message_id == leaf_id,
+                ThreadMessage.thread_uuid == thread_id
+            )
+            .order_by(position)
+        )
+        if limit:
+            query = query.where(position > func.cardinality(ThreadActivePath.message_ids) - limit)
+        result = await self._execute_query(query)
+        return [ThreadMessageRecord.from_row(row) for row in result]
+
+    async def advance_active_path(self, thread_id: UUID, parent_message_id: Optional[int], message_id: int) -> bool:
+        """
+        Append `message_id` to the snapshot when it continues the snapshotted leaf.
+
+        Returns False when it does not (a new branch or a missing snapshot), in which case the
+        caller should refresh the snapshot instead.
+        """
+        if not parent_message_id:
+            return False
+        query = (
+            update(ThreadActivePath)
+            .where(ThreadActivePath.thread_uuid == thread_id, ThreadActivePath.leaf_message_id == parent_message_id)
+            .values(
+                leaf_message_id=message_id,
+                message_ids=func.array_append(ThreadActivePath.message_ids, message_id),
+                updated_at=func.now()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        result = await self._execute_query(query)
+        return result.rowcount > 0
+
+    async def refresh_active_paths(self, thread_ids: Iterable[UUID]):
+        """Recompute the snapshots of the given threads from their last_message_id with a single upsert."""
+        anchor = (
+            select(
+                Thread.uuid.label("thread_uuid"),
+                ThreadMessage.id,
+                ThreadMessage.parent_message_id,
+                ThreadMessage.id.label("leaf_id"),
+                literal(0).label("depth")
+            )
+            .select_from(Thread)
+            .join(ThreadMessage, and_(
+                ThreadMessage.id == Thread.last_message_id,
+                ThreadMessage.thread_uuid == Thread.uuid
+            ))
+            .where(Thread.uuid.in_(list(thread_ids)))
+            .cte("snapshot_paths", recursive=True)
+        )
+        parent = aliased(ThreadMessage)
+        snapshot_paths = anchor.union_all(
+            select(
+                anchor.c.thread_uuid,
+                parent.id,
+                parent.parent_message_id,
+                anchor.c.leaf_id,
+                (anchor.c.depth + 1).label("depth")
+            )
+            .where(
+                parent.id == anchor.c.parent_message_id,
+                parent.thread_uuid == anchor.c.thread_uuid,
+                anchor.c.depth < MAX_CONVERSATION_DEPTH
+            )
+        )
+        snapshots = (
+            select(
+                snapshot_paths.c.thread_uuid,
+                snapshot_paths.c.leaf_id,
+                func.array_agg(aggregate_order_by(snapshot_paths.c.id, snapshot_paths.c.depth.desc())),
+                func.now(),
+                func.now()
+            )
+            .group_by(snapshot_paths.c.thread_uuid, snapshot_paths.c.leaf_id)
+        )
+        upsert = insert(ThreadActivePath).from_select(
+            ["thread_uuid", "leaf_message_id", "message_ids", "created_at", "updated_at"], snapshots
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[ThreadActivePath.thread_uuid],
+            set_={
+                "leaf_message_id": upsert.excluded.leaf_message_id,
+                "message_ids": upsert.excluded.message_ids,
+                "updated_at": upsert.excluded.updated_at
+            }
+        )
+        await self._execute_query(upsert)
+
+    async def delete_active_path(self, thread_id: UUID):
+        await self._execute_query(delete(ThreadActivePath).where(ThreadActivePath.thread_uuid == thread_id))
+
+
+class ThreadListDao(BaseDao):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session=session, db_model=Thread)
+
+    async def list_threads_by_activity(self, user_email: str, product: str, limit: int,
+                                       after: Optional[Tuple[datetime, int]] = None) -> List[Thread]:
+        """
+        Keyset page of a user's threads, most recently active first.
+
+        `after` is the (updated_at, id) of the last thread of the previous page; rows strictly older
+        than it are returned, so deep pages cost the same as the first one.
+        """
+        query = select(Thread).where(
+            Thread.user_email == user_email,
+            Thread.product == product,
+            Thread.is_deleted == False  # noqa: E712
+        )
+        if after:
+            query = query.where(tuple_(Thread.updated_at, Thread.id) < tuple_(*after))
+        query = query.order_by(Thread.updated_at.desc(), Thread.id.desc()).limit(limit)
+        result = await self._execute_query(query)
+        return result.scalars().all()
+
+    async def get_threads_version(self, user_email: str, product: str) -> tuple:
+        """
+        Cheap version of a user's thread list: (count, max updated_at, max id) over all their threads.
+
+        Deleted threads are included on purpose, since soft deletes bump updated_at and must change the version.
+        """
+        query = select(
+            func.count(Thread.id), func.max(Thread.updated_at), func.max(Thread.id)
+        ).where(Thread.user_email == user_email, Thread.product == product)
+        result = await self._execute_query(query)
+        return tuple(result.one())
+
+
+class ThreadSearchDao(BaseDao):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session=session, db_model=ThreadMessage)
+
+    async def search_threads(self, query: str, user_email: str, product: str, limit: int, offset: int = 0) -> List[tuple]:
+        """
+        Rank a user's threads by how well their messages match `query`.
+
+        Word matches use the GIN tsvector index; substring matches use the trigram index. Each row
+        carries the thread columns plus the best message `rank` and `match_count`.
+        """
+        search_document = literal_column(f"({SEARCH_DOCUMENT_SQL})")
+        search_vector = literal_column(f"to_tsvector('{SEARCH_TEXT_CONFIG}', {SEARCH_DOCUMENT_SQL})")
+        search_query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_TEXT_CONFIG}'"), query)
+        escaped_query = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rank = func.max(func.ts_rank_cd(search_vector, search_query)).label("rank")
+
+        search = (
+            select(
+                Thread.uuid,
+                Thread.title,
+                Thread.last_message_id,
+                Thread.updated_at,
+                rank,
+                func.count(ThreadMessage.id).label("match_count")
+            )
+            .select_from(ThreadMessage)
+            .join(Thread, Thread.uuid == ThreadMessage.thread_uuid)
+            .where(
+                Thread.user_email == user_email,
+                Thread.product == product,
+                Thread.is_deleted == False,  # noqa: E712
+                ThreadMessage.is_deleted == False,  # noqa: E712
+                or_(search_vector.op("@@")(search_query), search_document.ilike(f"%{escaped_query}%"))
+            )
+            .group_by(Thread.id)
+            .order_by(rank.desc(), Thread.updated_at.desc(), Thread.id.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        result = await self._execute_query(search)
+        return result.all()
+
+
+class ThreadMessageDao(BaseDao):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session=session, db_model=ThreadMessage)
+
+    async def set_thread_last_message(self, thread_id: UUID, message_id: int):
+        query = update(Thread).where(Thread.uuid == thread_id).values(
+            last_message_id=message_id, updated_at=get_current_time()
+        )
+        await self._execute_query(query)
+
+
+class ThreadMessageImportDao(BaseDao):
+    MESSAGE_ID_SEQUENCE = "thread_message_id_seq"
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session=session, db_model=ThreadMessage)
+
+    async def reserve_message_ids(self, count: int) -> List[int]:
+        """Draw `count` ids from the thread_message sequence in one round trip so parent links can be set up front."""
+        query = select(func.nextval(self.MESSAGE_ID_SEQUENCE)).select_from(func.generate_series(1, count))
+        result = await self._execute_query(query)
+        return result.scalars().all()
+
+    async def get_message_threads(self, message_ids: Iterable[int], thread_ids: Iterable[UUID]) -> Dict[int, UUID]:
+        """Which of `thread_ids` each message belongs to; messages in any other thread are left out."""
+        query = select(ThreadMessage.id, ThreadMessage.thread_uuid).where(
+            ThreadMessage.id.in_(list(message_ids)),
+            ThreadMessage.thread_uuid.in_(list(thread_ids))
+        )
+        result = await self._execute_query(query)
+        return {row.id: row.thread_uuid for row in result}
+
+    async def set_last_messages(self, last_message_ids: Dict[UUID, int]):
+        """Point each thread's last_message_id at its new leaf with a single executemany UPDATE."""
+        thread_table = Thread.__table__
+        query = (
+            update(thread_table)
+            .where(thread_table.c.uuid == bindparam("b_thread_uuid"))
+            .values(last_message_id=bindparam("b_last_message_id"))
+        )
+        await self._execute_query_many(query, [
+            {"b_thread_uuid": thread_id, "b_last_message_id": message_id}
+            for thread_id, message_id in last_message_ids.items()
+        ])
+
+    async def _execute_query_many(self, query, params: List[dict]):
+        return await self.session.execute(query, params)
+
+
+class ThreadPurgeDao(BaseDao):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session=session, db_model=Thread)
+
+    async def purge_deleted_threads(self, deleted_before: datetime, batch_size: int) -> Tuple[int, int, int]:
+        """
+        Hard-delete up to `batch_size` threads soft-deleted before `deleted_before`, with their
+        messages and summaries, in one statement.
+
+        The deletion time is thread.deleted_at (a9d4e7c2b318), oldest first. Threads are claimed
+        with FOR UPDATE SKIP LOCKED, so a purge never waits on a thread being written. Returns the
+        (threads, messages, summaries) row counts deleted.
+        """
+        purged_threads = (
+            select(Thread.uuid)
+            .where(Thread.is_deleted == True, THREAD_DELETED_AT < deleted_before)  # noqa: E712
+            .order_by(THREAD_DELETED_AT)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .cte("purged_threads")
+        )
+        purged_thread_uuids = select(purged_threads.c.uuid)
+        deleted_summaries = (
+            delete(ThreadMessageSummary)
+            .where(ThreadMessageSummary.thread_uuid.in_(purged_thread_uuids))
+            .returning(ThreadMessageSummary.uuid)
+            .cte("deleted_summaries")
+        )
+        deleted_messages = (
+            delete(ThreadMessage)
+            .where(ThreadMessage.thread_uuid.in_(purged_thread_uuids))
+            .returning(ThreadMessage.id)
+            .cte("deleted_messages")
+        )
+        deleted_threads = (
+            delete(Thread)
+            .where(Thread.uuid.in_(purged_thread_uuids))
+            .returning(Thread.id)
+            .cte("deleted_threads")
+        )
+        query = select(
+            select(func.count()).select_from(deleted_threads).scalar_subquery(),
+            select(func.count()).select_from(deleted_messages).scalar_subquery(),
+            select(func.count()).select_from(deleted_summaries).scalar_subquery()
+        )
+        result = await self._execute_query(query)
+        return tuple(result.one())
@@ -0,0 +1,13 @@
+from utils.exceptions import ApiException
+
+
+class InvalidCursorException(ApiException):
+    DEFAULT_ERROR_MESSAGE = "Invalid pagination cursor"
+
+
+class InvalidRevisionException(ApiException):
+    DEFAULT_ERROR_MESSAGE = "Invalid message revision"
+
+
+class InvalidImportException(ApiException):
+    DEFAULT_ERROR_MESSAGE = "Invalid message import"
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import timedelta
+
+from config.logging import logger
+from config.settings import loaded_config
+from prometheus.metrics import THREAD_PURGE_BATCHES, THREAD_PURGE_DELETED_ROWS, THREAD_PURGE_LAST_SUCCESS
+from threads.dao import ThreadPurgeDao
+from utils.connection_handler import ConnectionHandler
+from utils.sqlalchemy import get_current_time
+
+PURGE_JOB_ID = "purge_deleted_threads"
+# Key of the Postgres advisory lock that lets a single worker run the purge at a time
+PURGE_ADVISORY_LOCK_KEY = 72_117_017
+
+
+async def purge_deleted_threads():
+    """
+    Hard-delete threads soft-deleted more than `thread_purge_retention_days` ago.
+
+    Every worker schedules the job, but a run only proceeds in the worker holding the purge advisory
+    lock; the others skip that interval. Work is split into transactions of `thread_purge_batch_size`
+    threads with a pause between them, and a run stops after `thread_purge_max_batches_per_run`
+    batches; whatever is left is picked up by the next run. Retention counts from thread.deleted_at.
+    """
+    async with loaded_config.connection_manager.advisory_lock(PURGE_ADVISORY_LOCK_KEY) as locked:
+        if not locked:
+            logger.info("Purge of deleted threads skipped, another worker holds the purge lock")
+            return
+        await _purge_deleted_thread_batches()
+
+
+async def _purge_deleted_thread_batches():
+    deleted_before = get_current_time() - timedelta(days=int(loaded_config.thread_purge_retention_days))
+    batch_size = int(loaded_config.thread_purge_batch_size)
+
+    for _ in range(int(loaded_config.thread_purge_max_batches_per_run)):
+        connection_handler = ConnectionHandler(connection_manager=loaded_config.connection_manager)
+        try:
+            purge_dao = ThreadPurgeDao(session=connection_handler.session)
+            threads, messages, summaries = await purge_dao.purge_deleted_threads(deleted_before, batch_size)
+            await connection_handler.session_commit()
+        except Exception as exp:
+            await connection_handler.session.rollback()
+            THREAD_PURGE_BATCHES.labels(status="error").inc()
+            logger.error("Purge of deleted threads failed: %s", str(exp))
+            return
+        finally:
+            await connection_handler.close()
+
+        THREAD_PURGE_BATCHES.labels(status="success").inc()
+        THREAD_PURGE_DELETED_ROWS.labels(table="thread").inc(threads)
+        THREAD_PURGE_DELETED_ROWS.labels(table="thread_message").inc(messages)
+        THREAD_PURGE_DELETED_ROWS.labels(table="thread_message_summary").inc(summaries)
+        if threads < batch_size:
+            break
+        await asyncio.sleep(float(loaded_config.thread_purge_batch_pause_seconds))
+
+    THREAD_PURGE_LAST_SUCCESS.set_to_current_time()
+
+
+def schedule_thread_purge(scheduler):
+    if not loaded_config.thread_purge_enabled:
+        return
+    scheduler.add_job(
+        purge_deleted_threads,
+        "interval",
+        seconds=int(loaded_config.thread_purge_interval_seconds),
+        id=PURGE_JOB_ID,
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, ForeignKey, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+
+from utils.sqlalchemy import Base, TimestampMixin
+
+
+class ThreadActivePath(Base, TimestampMixin):
+    """
+    Denormalized snapshot of a thread's active conversation: the message ids from the root to
+    `leaf_message_id`, root first. Kept in step with thread.last_message_id by the message write paths.
+    """
+    __tablename__ = "thread_active_path"
+
+    thread_uuid = Column(UUID(as_uuid=True), ForeignKey("thread.uuid", ondelete="CASCADE"), primary_key=True)
+    leaf_message_id = Column(Integer, nullable=False)
+    message_ids = Column(ARRAY(Integer), nullable=False)
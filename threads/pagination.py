@@ -0,0 +1,24 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+import orjson
+
+from threads.exceptions import InvalidCursorException
+
+
+def encode_thread_cursor(updated_at: datetime, thread_id: int) -> str:
+    """Opaque cursor pointing just past the thread with this (updated_at, id) in activity order."""
+    payload = orjson.dumps([updated_at.isoformat(), thread_id])
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_thread_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, thread_id = orjson.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(updated_at), int(thread_id)
+    except Exception as exp:
+        raise InvalidCursorException() from exp
@@ -0,0 +1,91 @@
+from typing import Iterable, List
+from uuid import UUID
+
+
+class ThreadMessageRecord:
+    """
+    Compact, read-only view of the thread_message columns needed to render a conversation.
+
+    Built once per row straight from the selected columns (or an ORM object) and serialized once
+    into the wire shape the caller needs.
+    """
+    __slots__ = ("id", "parent_message_id", "role", "content", "display_text", "is_json",
+                 "question_config", "is_disliked", "prompt_details")
+
+    def __init__(self, id, parent_message_id, role, content, display_text, is_json, question_config,
+                 is_disliked, prompt_details):
+        self.id = id
+        self.parent_message_id = parent_message_id
+        self.role = role
+        self.content = content
+        self.display_text = display_text
+        self.is_json = is_json
+        self.question_config = question_config
+        self.is_disliked = is_disliked
+        self.prompt_details = prompt_details
+
+    @classmethod
+    def from_row(cls, row) -> "ThreadMessageRecord":
+        role = row.role
+        return cls(
+            id=row.id,
+            parent_message_id=row.parent_message_id,
+            role=getattr(role, "value", role),
+            content=row.content,
+            display_text=row.display_text,
+            is_json=row.is_json,
+            question_config=row.question_config,
+            is_disliked=row.is_disliked,
+            prompt_details=row.prompt_details
+        )
+
+    def to_conversation_message(self, thread_id: UUID) -> dict:
+        """Shape used for LLM context assembly (camelCase keys)."""
+        return {
+            "id": self.id,
+            "role": self.role,
+            "content": self.content,
+            "displayText": self.display_text,
+            "conversationId": thread_id,
+            "parentId": self.parent_message_id,
+            "isJson": self.is_json,
+            "questionConfig": self.question_config,
+            "isDisliked": self.is_disliked,
+            "prompt_details": self.prompt_details
+        }
+
+    def to_thread_message(self, thread_id: UUID) -> dict:
+        """Shape returned by the thread message APIs (snake_case keys)."""
+        return {
+            "id": self.id,
+            "role": self.role,
+            "content": self.content,
+            "display_text": self.display_text,
+            "thread_uuid": thread_id,
+            "parent_message_id": self.parent_message_id,
+            "is_json": self.is_json,
+            "question_config": self.question_config,
+            "is_disliked": self.is_disliked,
+            "prompt_details": self.prompt_details
+        }
+
+
+def serialize_conversation_messages(records: Iterable[ThreadMessageRecord], thread_id: UUID) -> List[dict]:
+    return [record.to_conversation_message(thread_id) for record in records]
+
+
+def serialize_thread_messages(records: Iterable[ThreadMessageRecord], thread_id: UUID) -> List[dict]:
+    return [record.to_thread_message(thread_id) for record in records]
+
+
+def serialize_thread(thread) -> dict:
+    return {
+        "uuid": thread.uuid,
+        "title": thread.title,
+        "product": getattr(thread.product, "value", thread.product),
+        "user_email": thread.user_email,
+        "last_message_id": thread.last_message_id,
+        "meta": thread.meta,
+        "created_at": thread.created_at,
+        "updated_at": thread.updated_at
+    }
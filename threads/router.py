@@ -32,4 +32,15 @@ threads_router_v2.add_api_route('/search', methods=['GET'], endpoint=ThreadMessa
 threads_router_v3 = APIRouter(route_class=CustomRequestRoute, prefix='/threads')
 threads_router_v3.add_api_route('/', methods=['GET'], endpoint=ThreadView.get_v3)
 threads_router_v3.add_api_route('/thread/{thread_id}/messages/', methods=['GET'],
-                                endpoint=ThreadMessageView.get_v3)
\ No newline at end of file
+                                endpoint=ThreadMessageView.get_v3)
+threads_router_v3.add_api_route('/messages/batch/', methods=['POST'], endpoint=ThreadMessageView.batch_get_v3)
+threads_router_v3.add_api_route('/messages/bulk/', methods=['POST'], endpoint=ThreadMessageView.bulk_post_v3)
+threads_router_v3.add_api_route('/search', methods=['GET'], endpoint=ThreadMessageView.search_messages_v3)
+
+
+threads_router_v4 = APIRouter(route_class=CustomRequestRoute, prefix='/threads')
+threads_router_v4.add_api_route('/', methods=['GET'], endpoint=ThreadView.get_v4)
+threads_router_v4.add_api_route('/thread/{thread_id}/messages/', methods=['GET'],
+                                endpoint=ThreadMessageView.get_v4)
+threads_router_v4.add_api_route('/thread/{thread_id}/messages/revisions/', methods=['GET'],
+                                endpoint=ThreadMessageView.get_revisions_v4)
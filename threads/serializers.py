@@ -1,6 +1,9 @@
-from typing import Union
+import uuid
+from typing import List, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
+
+MESSAGE_ROLES = ("USER", "SYSTEM", "ASSISTANT")
 
 class ThreadQueryParams(BaseModel):
     user_email: str = Field(..., description="The email of the user to filter projects by")
@@ -8,3 +11,66 @@ class ThreadQueryParams(BaseModel):
     page: int = Field(default=1, ge=1, description="Page number for pagination")
     page_size: int = Field(10, ge=1, le=100, description="Number of items per page")
     search: str = Field(None, description="Search query for thread messages")
+
+
+class ThreadSearchParams(BaseModel):
+    query: str = Field(..., min_length=1, max_length=500, description="Words or a substring to look for in messages")
+    email: str = Field(..., description="The email of the user whose threads are searched")
+    product: str = Field(..., description="The fynix product to filter the threads")
+    page: int = Field(default=1, ge=1, description="Page number for pagination")
+    page_size: int = Field(10, ge=1, le=100, description="Number of items per page")
+
+
+class ThreadCursorQueryParams(BaseModel):
+    user_email: str = Field(..., description="The email of the user to filter projects by")
+    product: str = Field(..., description="The fynix product to filter the threads")
+    cursor: Optional[str] = Field(None, description="Opaque cursor returned as next_cursor by the previous page")
+    page_size: int = Field(20, ge=1, le=100, description="Number of items per page")
+
+
+class ThreadMessageWindowParams(BaseModel):
+    last_message_id: Optional[int] = Field(None, description="Leaf of the branch to read, defaults to the thread's last message")
+    cursor: Optional[int] = Field(None, description="next_cursor of the previous window, to scroll further back")
+    limit: int = Field(20, ge=1, le=200, description="Number of messages to return, counted back from the leaf")
+
+
+class ThreadRevisionParams(BaseModel):
+    last_message_id: Optional[int] = Field(None, description="Leaf of the branch to read, defaults to the thread's last message")
+    node_id: Optional[int] = Field(None, description="Message whose sibling revision should be switched to")
+    revision: Optional[int] = Field(None, ge=1, description="1-based sibling revision of node_id to switch to")
+
+
+class BatchThreadMessagesRequest(BaseModel):
+    thread_ids: List[uuid.UUID] = Field(..., min_items=1, max_items=50,
+                                        description="Threads whose current conversation is requested")
+
+
+class ImportedThreadMessage(BaseModel):
+    ref: str = Field(..., description="Client-side id of the message, unique within its thread")
+    parent_ref: Optional[str] = Field(None, description="ref of the parent message in the same payload")
+    parent_message_id: Optional[int] = Field(None, description="Existing message to attach to when parent_ref is not set")
+    role: str
+    content: Optional[str] = None
+    display_text: Optional[str] = None
+    is_json: bool = False
+    is_disliked: bool = False
+    question_config: Optional[dict] = None
+    prompt_details: Optional[dict] = None
+
+    @validator("role")
+    def validate_role(cls, role):
+        role = role.upper()
+        if role not in MESSAGE_ROLES:
+            raise ValueError(f"role must be one of {', '.join(MESSAGE_ROLES)}")
+        return role
+
+
+class ImportedThread(BaseModel):
+    thread_id: uuid.UUID
+    messages: List[ImportedThreadMessage] = Field(..., min_items=1)
+    last_message_ref: Optional[str] = Field(None, description="ref of the new last message, defaults to the last one sent")
+
+
+class BulkThreadMessagesRequest(BaseModel):
+    requested_by: str
+    threads: List[ImportedThread] = Field(..., min_items=1, max_items=100)
@@ -1,28 +1,57 @@
 import uuid
+from collections import deque
+from typing import Dict, List, Tuple
 
 from fastapi import HTTPException
 from fex_utilities.threads.services import ThreadService
 from fex_utilities.threads.dao import ThreadMessageSummaryDao
 
+from threads.dao import ConversationPathDao, ThreadActivePathDao, ThreadMessageImportDao, THREAD_IDENTITY
+from threads.exceptions import InvalidImportException
+from threads.serializers import ImportedThread, ImportedThreadMessage
 from utils.common import UserData
 from utils.connection_handler import ConnectionHandler
+from utils.sqlalchemy import get_current_time
 
 
 class ThreadOwnershipService:
     def __init__(self, connection_handler: ConnectionHandler):
+        self.connection_handler = connection_handler
         self.thread_service = ThreadService(connection_handler=connection_handler)
+        self.path_dao = ConversationPathDao(session=connection_handler.session)
 
     async def check_ownership(self, thread_id: uuid.UUID, user_data: UserData):
         if not user_data:
             raise HTTPException(status_code=403, detail="Unauthorized access to this thread.")
+        return await self.check_email_ownership(thread_id, user_data.email)
 
-        thread = await self.thread_service.thread_dao.get_thread_by_id(thread_id)
+    async def check_email_ownership(self, thread_id: uuid.UUID, user_email: str):
+        """Ownership by the requester's email alone, for the v1 APIs that carry no user data."""
+        thread = self.connection_handler.get_remembered(THREAD_IDENTITY, thread_id)
+        if thread is None:
+            thread = await self.thread_service.thread_dao.get_thread_by_id(thread_id)
+            if thread:
+                self.connection_handler.remember(THREAD_IDENTITY, thread_id, thread)
 
-        if not thread or not self._is_user_authorized(thread, user_data):
+        if not thread or not user_email or thread.user_email != user_email:
             raise HTTPException(status_code=403, detail="Unauthorized access to this thread.")
 
         return thread
 
+    async def check_ownership_many(self, thread_ids: List[uuid.UUID], user_data: UserData):
+        if not user_data:
+            raise HTTPException(status_code=403, detail="Unauthorized access to this thread.")
+
+        threads = await self.path_dao.get_threads_by_uuids(thread_ids)
+
+        if len(threads) != len(set(thread_ids)) or not all(self._is_user_authorized(thread, user_data)
+                                                           for thread in threads):
+            raise HTTPException(status_code=403, detail="Unauthorized access to this thread.")
+
+        for thread in threads:
+            self.connection_handler.remember(THREAD_IDENTITY, thread.uuid, thread)
+        return threads
+
     @staticmethod
     def _is_user_authorized(thread, user_data):
         return thread.user_email == user_data.email
@@ -38,4 +67,111 @@ class ThreadMessageSummaryService:
         )
 
 
+class ThreadMessageImportService:
+    MAX_IMPORT_MESSAGES = 10000
+
+    def __init__(self, connection_handler: ConnectionHandler):
+        self.import_dao = ThreadMessageImportDao(session=connection_handler.session)
+        self.active_path_dao = ThreadActivePathDao(session=connection_handler.session)
+
+    async def validate_threads(self, threads: List[ImportedThread]) -> List[Tuple[ImportedThread, List[ImportedThreadMessage]]]:
+        """
+        Check an import before anything is written, raising InvalidImportException when it cannot be applied.
+
+        Returns:
+            List[Tuple[ImportedThread, List[ImportedThreadMessage]]]: Every thread with its messages
+            ordered parents first, as `import_threads` takes them.
+        """
+        ordered_threads = [(thread, self._order_parents_first(thread)) for thread in threads]
+        total_messages = sum(len(messages) for _, messages in ordered_threads)
+        if total_messages > self.MAX_IMPORT_MESSAGES:
+            raise InvalidImportException(f"At most {self.MAX_IMPORT_MESSAGES} messages can be imported at once")
+        for thread in threads:
+            last_message_ref = thread.last_message_ref or thread.messages[-1].ref
+            if last_message_ref not in {message.ref for message in thread.messages}:
+                raise InvalidImportException(f"Unknown last_message_ref {last_message_ref} in thread {thread.thread_id}")
+        await self._validate_existing_parents(threads)
+        return ordered_threads
+
+    async def import_threads(self, ordered_threads: List[Tuple[ImportedThread, List[ImportedThreadMessage]]],
+                             user_id: int) -> Dict[str, Dict[str, int]]:
+        """
+        Insert message trees for several threads with one set-based write, without committing.
+
+        Takes the result of `validate_threads`. Ids are reserved from the sequence up front so parent
+        links inside the batch are resolved in memory, and every thread's last_message_id and active
+        path snapshot are set once at the end.
+
+        Returns:
+            Dict[str, Dict[str, int]]: The new message id of every ref, per thread uuid.
+        """
+        total_messages = sum(len(messages) for _, messages in ordered_threads)
+        message_ids = iter(await self.import_dao.reserve_message_ids(total_messages))
+        now = get_current_time()
+        mappings = []
+        last_message_ids = {}
+        imported_ids = {}
+        for thread, messages in ordered_threads:
+            ref_ids = {}
+            for message in messages:
+                ref_ids[message.ref] = next(message_ids)
+                mappings.append({
+                    "id": ref_ids[message.ref],
+                    "thread_uuid": thread.thread_id,
+                    "parent_message_id": ref_ids[message.parent_ref] if message.parent_ref
+                    else message.parent_message_id,
+                    "role": message.role,
+                    "content": message.content,
+                    "display_text": message.display_text,
+                    "is_json": message.is_json,
+                    "is_disliked": message.is_disliked,
+                    "is_deleted": False,
+                    "user_id": user_id,
+                    "question_config": message.question_config,
+                    "prompt_details": message.prompt_details,
+                    "created_at": now,
+                    "updated_at": now
+                })
+            last_message_ids[thread.thread_id] = ref_ids[thread.last_message_ref or thread.messages[-1].ref]
+            imported_ids[str(thread.thread_id)] = ref_ids
+
+        await self.import_dao.bulk_insert(mappings, commit=False)
+        await self.import_dao.set_last_messages(last_message_ids)
+        await self.active_path_dao.refresh_active_paths(last_message_ids.keys())
+        return imported_ids
 
+    @staticmethod
+    def _order_parents_first(thread: ImportedThread) -> List[ImportedThreadMessage]:
+        """Order a thread's messages so every parent precedes its children, rejecting dangling refs and cycles."""
+        children = {}
+        for message in thread.messages:
+            children.setdefault(message.parent_ref, []).append(message)
+        if len({message.ref for message in thread.messages}) != len(thread.messages):
+            raise InvalidImportException(f"Duplicate message refs in thread {thread.thread_id}")
+
+        ordered = []
+        pending = deque(children.get(None, []))
+        while pending:
+            message = pending.popleft()
+            ordered.append(message)
+            pending.extend(children.get(message.ref, []))
+
+        if len(ordered) != len(thread.messages):
+            raise InvalidImportException(f"Unresolvable parent_ref in thread {thread.thread_id}")
+        return ordered
+
+    async def _validate_existing_parents(self, threads: List[ImportedThread]):
+        expected_threads = {
+            (message.parent_message_id, thread.thread_id)
+            for thread in threads for message in thread.messages
+            if message.parent_message_id and not message.parent_ref
+        }
+        if not expected_threads:
+            return
+        message_threads = await self.import_dao.get_message_threads(
+            {message_id for message_id, _ in expected_threads},
+            {thread_id for _, thread_id in expected_threads}
+        )
+        for message_id, thread_id in expected_threads:
+            if message_threads.get(message_id) != thread_id:
+                raise InvalidImportException(f"Message {message_id} does not belong to thread {thread_id}")
@@ -1,10 +1,14 @@
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from uuid import UUID
 
 from fex_utilities.threads.services import ThreadService
 
+from threads.cache import conversation_path_cache, thread_version
+from threads.dao import ConversationPathDao, ThreadActivePathDao, THREAD_IDENTITY
+from threads.records import ThreadMessageRecord, serialize_conversation_messages
+from threads.exceptions import InvalidRevisionException
 from utils.base_view import BaseView
-from utils.connection_handler import execute_read_db_operation
+from utils.connection_handler import execute_db_operation, execute_read_db_operation
 
 
 async def append_thread_data(threads, data):
@@ -19,12 +23,18 @@ async def append_thread_data(threads, data):
         dict: The updated data with appended thread messages.
     """
     try:
-        for thread in threads:
-            thread_id = thread["uuid"]
-            last_message_id = thread["last_message_id"]
-            thread_messages = await get_current_thread_messages(thread_id=thread_id, last_message_id=last_message_id)
-            # Append processed messages to data
-            data["messages"] = thread_messages + data["messages"]
+        threads_paths = await get_threads_current_paths([
+            (thread["uuid"], thread["last_message_id"],
+             (thread["last_message_id"], thread["updated_at"]) if thread.get("updated_at") else None)
+            for thread in threads
+        ])
+        # Later threads go first, matching the order of prepending each thread in turn
+        messages = []
+        for thread in reversed(threads):
+            messages.extend(serialize_conversation_messages(threads_paths.get(str(thread["uuid"]), []),
+                                                            thread["uuid"]))
+        messages.extend(data["messages"])
+        data["messages"] = messages
 
         return data
     except Exception as e:
@@ -44,13 +54,146 @@ async def append_thread_data_operation(connection_handler, thread_id: UUID) -> T
         List[dict]: A list of thread messages.
     """
     thread_service = ThreadService(connection_handler=connection_handler)
-    thread = await thread_service.thread_dao.get_thread_by_id(thread_id)
+    thread = connection_handler.get_remembered(THREAD_IDENTITY, thread_id)
+    if thread is None:
+        thread = await thread_service.thread_dao.get_thread_by_id(thread_id)
     thread_messages = await thread_service.get_thread_messages(thread_id=thread_id)
     return thread_messages, thread
 
 
-async def get_current_thread_messages(thread_id: UUID, last_message_id: Optional[int] = None, last_question_id: Optional[int] = None):
-    thread_messages, thread = await execute_read_db_operation(append_thread_data_operation, thread_id)
+async def active_path_operation(connection_handler, thread_id: UUID, leaf_message_id: Optional[int] = None,
+                                limit: Optional[int] = None) -> List:
+    """
+    Operation to fetch only the ancestor chain of the active leaf of a thread.
+
+    Args:
+        connection_handler: The connection handler for database access.
+        thread_id (UUID): The ID of the thread.
+        leaf_message_id (int, optional): The leaf to resolve; defaults to the thread's last_message_id.
+        limit (int, optional): Only return the last `limit` messages of the chain.
+
+    Returns:
+        List[ThreadMessageRecord]: The messages on the root-to-leaf path, root first.
+    """
+    path_dao = ConversationPathDao(session=connection_handler.session)
+    return await path_dao.get_active_path(thread_id=thread_id, leaf_message_id=leaf_message_id, limit=limit)
+
+
+async def snapshot_path_operation(connection_handler, thread_id: UUID, leaf_message_id: Optional[int] = None,
+                                  limit: Optional[int] = None) -> List:
+    """
+    Operation to read the active path from the thread_active_path snapshot.
+
+    Returns:
+        List[ThreadMessageRecord]: The snapshotted path, root first, or an empty list when the
+        snapshot is missing or does not end at the requested leaf.
+    """
+    active_path_dao = ThreadActivePathDao(session=connection_handler.session)
+    return await active_path_dao.get_snapshot_path(thread_id=thread_id, leaf_message_id=leaf_message_id, limit=limit)
+
+
+async def _run_read_operation(connection_handler, operation, *args):
+    """Run `operation` on the request's own handler when one is given, otherwise on a fresh read connection."""
+    if connection_handler is not None:
+        return await operation(connection_handler, *args)
+    return await execute_read_db_operation(operation, *args)
+
+
+async def _read_active_path(connection_handler, thread_id: UUID, leaf_message_id: Optional[int],
+                            limit: Optional[int] = None) -> List[ThreadMessageRecord]:
+    """
+    Snapshot first, then the ancestor walk. The leaf normally comes from the thread row read on the
+    primary, so a leaf the read replica cannot resolve is one it has not replicated yet: read it there.
+    """
+    path = await _run_read_operation(connection_handler, snapshot_path_operation, thread_id, leaf_message_id, limit)
+    if not path:
+        path = await _run_read_operation(connection_handler, active_path_operation, thread_id, leaf_message_id, limit)
+    if not path and leaf_message_id:
+        path = await execute_db_operation(active_path_operation, thread_id, leaf_message_id, limit)
+    return path
+
+
+def _remembered_leaf(connection_handler, thread_id: UUID, leaf_message_id: Optional[int]) -> Optional[int]:
+    """Resolve a missing leaf from the thread already loaded in this request, if any."""
+    if leaf_message_id or connection_handler is None:
+        return leaf_message_id
+    thread = connection_handler.get_remembered(THREAD_IDENTITY, thread_id)
+    return thread.last_message_id if thread is not None else None
+
+
+def _remembered_version(connection_handler, thread_id: UUID):
+    """Version of the thread already loaded in this request; None (no caching) when there is none."""
+    if connection_handler is None:
+        return None
+    thread = connection_handler.get_remembered(THREAD_IDENTITY, thread_id)
+    return thread_version(thread) if thread is not None else None
+
+
+async def get_thread_message_window(thread_id: UUID, leaf_message_id: Optional[int] = None, limit: int = 20,
+                                    connection_handler=None) -> Tuple[List[ThreadMessageRecord], Optional[int]]:
+    """
+    Return the last `limit` messages of the active path ending at `leaf_message_id`.
+
+    The second value is the cursor for the previous window: the id of the parent of the oldest
+    returned message, or None once the root has been reached. Passing it back as the leaf scrolls
+    further up the same branch.
+    """
+    leaf_message_id = _remembered_leaf(connection_handler, thread_id, leaf_message_id)
+    cached_path = conversation_path_cache.get(thread_id, leaf_message_id,
+                                              _remembered_version(connection_handler, thread_id))
+    if cached_path is not None:
+        window = cached_path[-limit:]
+    else:
+        window = await _read_active_path(connection_handler, thread_id, leaf_message_id, limit)
+
+    next_cursor = window[0].parent_message_id if window else None
+    return window, next_cursor
+
+
+async def get_current_thread_messages(thread_id: UUID, last_message_id: Optional[int] = None,
+                                      last_question_id: Optional[int] = None, active_path_only: bool = True,
+                                      connection_handler=None):
+    path = await get_current_thread_path(thread_id, last_message_id, last_question_id, active_path_only,
+                                         connection_handler)
+    return serialize_conversation_messages(path, thread_id)
+
+
+async def get_current_thread_path(thread_id: UUID, last_message_id: Optional[int] = None,
+                                  last_question_id: Optional[int] = None, active_path_only: bool = True,
+                                  connection_handler=None) -> List[ThreadMessageRecord]:
+    """
+    Resolve the conversation a thread currently shows.
+
+    When the caller passes its request's `connection_handler`, every query runs on that one
+    connection and a thread already loaded by the ownership check is reused instead of fetched again.
+    """
+    leaf_message_id = _remembered_leaf(connection_handler, thread_id, last_question_id or last_message_id)
+    version = _remembered_version(connection_handler, thread_id)
+    cached_path = conversation_path_cache.get(thread_id, leaf_message_id, version)
+    if cached_path is not None:
+        return cached_path
+
+    path = await _resolve_current_thread_path(thread_id, last_message_id, last_question_id, active_path_only,
+                                              connection_handler)
+    conversation_path_cache.set(thread_id, leaf_message_id, path, version)
+    return path
+
+
+async def _resolve_current_thread_path(thread_id: UUID, last_message_id: Optional[int] = None,
+                                       last_question_id: Optional[int] = None, active_path_only: bool = True,
+                                       connection_handler=None) -> List[ThreadMessageRecord]:
+    tree = ConversationTree()
+    tree.current_conv_thread_id = thread_id
+
+    if active_path_only:
+        leaf_message_id = _remembered_leaf(connection_handler, thread_id, last_question_id or last_message_id)
+        # Leaf off the snapshotted branch (or no snapshot yet) walks its ancestors instead
+        path = await _read_active_path(connection_handler, thread_id, leaf_message_id)
+        if path:
+            return path
+        # No resolvable leaf (e.g. thread without last_message_id), fall back to walking the full tree
+
+    thread_messages, thread = await _run_read_operation(connection_handler, append_thread_data_operation, thread_id)
     if last_question_id:
         latest_message_id = last_question_id
     elif last_message_id:
@@ -58,9 +201,7 @@ async def get_current_thread_messages(thread_id: UUID, last_message_id: Optional
     else:
         latest_message_id = thread.last_message_id
 
-    tree = ConversationTree()
-    tree.current_conv_thread_id = thread_id
-    tree.build_tree(thread_messages)
+    tree.build_tree([ThreadMessageRecord.from_row(message) for message in thread_messages])
 
     if latest_message_id:
         path = tree.find_path_to_node(latest_message_id or 0)
@@ -71,90 +212,199 @@ async def get_current_thread_messages(thread_id: UUID, last_message_id: Optional
     return tree.conv_messages
 
 
+async def batch_thread_messages_operation(connection_handler, thread_refs: List[Tuple[UUID, Optional[int]]]) -> Dict:
+    """
+    Operation to resolve the active conversation of many threads in a fixed number of queries.
+
+    Args:
+        connection_handler: The connection handler for database access.
+        thread_refs (list): (thread_id, leaf_message_id) pairs; a missing leaf means the thread's last message.
+
+    Returns:
+        Dict[str, List[ThreadMessageRecord]]: Conversation paths keyed by thread uuid string.
+    """
+    path_dao = ConversationPathDao(session=connection_handler.session)
+    thread_ids = {str(thread_id): thread_id for thread_id, _ in thread_refs}
+    leaves = {str(thread_id): leaf_message_id for thread_id, leaf_message_id in thread_refs}
+
+    unresolved_thread_ids = [thread_id for thread_id, leaf_message_id in thread_refs if not leaf_message_id]
+    if unresolved_thread_ids:
+        for thread in await path_dao.get_threads_by_uuids(unresolved_thread_ids):
+            leaves[str(thread.uuid)] = thread.last_message_id
+
+    paths = {}
+    path_threads = {}
+    leaf_message_ids = {leaf_message_id for leaf_message_id in leaves.values() if leaf_message_id}
+    if leaf_message_ids:
+        for row in await path_dao.get_active_paths(leaf_message_ids, thread_ids.values()):
+            paths.setdefault(row.leaf_id, []).append(ThreadMessageRecord.from_row(row))
+            path_threads[row.leaf_id] = str(row.thread_uuid)
+
+    threads_paths = {}
+    fallback_thread_ids = []
+    for thread_key, leaf_message_id in leaves.items():
+        if leaf_message_id in paths and path_threads[leaf_message_id] == thread_key:
+            threads_paths[thread_key] = paths[leaf_message_id]
+        elif not leaf_message_id:
+            fallback_thread_ids.append(thread_ids[thread_key])
+
+    # Threads without any last message follow the first revision from the root, which needs the full tree
+    if fallback_thread_ids:
+        messages_by_thread = {}
+        for row in await path_dao.get_messages_for_threads(fallback_thread_ids):
+            messages_by_thread.setdefault(str(row.thread_uuid), []).append(ThreadMessageRecord.from_row(row))
+        for thread_id in fallback_thread_ids:
+            tree = ConversationTree()
+            tree.current_conv_thread_id = thread_id
+            tree.build_tree(messages_by_thread.get(str(thread_id), []))
+            tree.process_conversation_tree(0, 1)
+            threads_paths[str(thread_id)] = tree.conv_messages
+
+    return threads_paths
+
+
+async def get_threads_current_paths(thread_refs: List[Tuple[UUID, Optional[int], Optional[Tuple]]],
+                                    connection_handler=None) -> Dict[str, List[ThreadMessageRecord]]:
+    """
+    Batched counterpart of get_current_thread_path for many threads.
+
+    `thread_refs` are (thread_id, leaf_message_id, thread_version) triples; cached conversations of
+    the same version are served from memory, and the rest are resolved together on the request's
+    `connection_handler`, or on one fresh read connection without it.
+    Threads whose leaf cannot be resolved are left out of the result.
+    """
+    threads_paths = {}
+    pending_refs = []
+    versions = {}
+    for thread_id, leaf_message_id, version in thread_refs:
+        cached_path = conversation_path_cache.get(thread_id, leaf_message_id, version)
+        if cached_path is not None:
+            threads_paths[str(thread_id)] = cached_path
+        else:
+            pending_refs.append((thread_id, leaf_message_id))
+            versions[str(thread_id)] = version
+
+    if pending_refs:
+        resolved = await _run_read_operation(connection_handler, batch_thread_messages_operation, pending_refs)
+        for thread_id, leaf_message_id in pending_refs:
+            path = resolved.get(str(thread_id))
+            if path is not None:
+                conversation_path_cache.set(thread_id, leaf_message_id, path, versions[str(thread_id)])
+                threads_paths[str(thread_id)] = path
+
+    return threads_paths
+
+
+async def revision_path_operation(connection_handler, thread_id: UUID, leaf_message_id: Optional[int] = None,
+                                  node_id: Optional[int] = None, revision: Optional[int] = None) -> List[Tuple]:
+    """
+    Operation to resolve a conversation path annotated with the revisions available at every turn.
+
+    The tree is built from the (id, parent) skeleton only; message content is fetched for the
+    resolved path alone. When `node_id` and `revision` are given, the path switches to that
+    sibling revision of `node_id` and then follows the first revision of each later turn.
+
+    Returns:
+        List[Tuple[ThreadMessageRecord, int, int]]: (message, revision, revision_count), root first.
+    """
+    path_dao = ConversationPathDao(session=connection_handler.session)
+    tree = ConversationTree()
+    tree.current_conv_thread_id = thread_id
+    tree.build_tree(await path_dao.get_thread_skeleton(thread_id))
+
+    if node_id:
+        if node_id not in tree.parent_index:
+            raise InvalidRevisionException(f"Message {node_id} does not belong to this thread")
+        parent_id = tree.parent_index[node_id]
+        if not revision or not 1 <= revision <= len(tree.children_index[parent_id]):
+            raise InvalidRevisionException(f"Message {node_id} has no revision {revision}")
+        path = tree.find_path_to_node(parent_id) or []
+        tree.process_conversation_tree(parent_id, revision)
+        path.extend(tree.conv_messages)
+    else:
+        if not leaf_message_id:
+            thread = connection_handler.get_remembered(THREAD_IDENTITY, thread_id)
+            if thread is None:
+                thread = (await path_dao.get_threads_by_uuids([thread_id]) or [None])[0]
+            leaf_message_id = thread.last_message_id if thread else None
+        if leaf_message_id:
+            path = tree.find_path_to_node(leaf_message_id) or []
+        else:
+            tree.process_conversation_tree(0, 1)
+            path = tree.conv_messages
+
+    message_ids = [node.id for node in path]
+    records = {record.id: record for record in await path_dao.get_records_by_ids(thread_id, message_ids)}
+    return [(records[message_id], *tree.get_revision(message_id)) for message_id in message_ids
+            if message_id in records]
+
+
 class ConversationTree:
     def __init__(self):
         self.conv_messages_tree = {}
+        self.children_index = {}
+        self.parent_index = {}
+        self.sibling_index = {}
         self.conv_messages = []
         self.current_conv_thread_id = 0
 
     # Python equivalent of buildTree
-    def build_tree(self, messages):
+    def build_tree(self, messages: List[ThreadMessageRecord]):
         self.conv_messages_tree = dict()
-        self.conv_messages_tree[0] = {"children": []}
+        self.children_index = {0: []}
+        self.parent_index = dict()
+        self.sibling_index = dict()
 
-        # First, create the structure for each message
+        # First, index each message and remember its parent
         for message in messages:
-            self.conv_messages_tree[message.id] = message.__dict__
-            self.conv_messages_tree[message.id]["children"] = []
+            self.conv_messages_tree[message.id] = message
+            self.children_index[message.id] = []
+            self.parent_index[message.id] = message.parent_message_id or 0
 
-        # Then, associate each message with its parent
+        # Then, associate each message with its parent, recording its 1-based position among siblings
         for message in messages:
-            parent_id = message.parent_message_id or 0
-            self.conv_messages_tree[parent_id]["children"].append(self.conv_messages_tree[message.id])
+            siblings = self.children_index[self.parent_index[message.id]]
+            siblings.append(message)
+            self.sibling_index[message.id] = len(siblings)
+
+    def get_revision(self, message_id) -> Tuple[int, int]:
+        """(revision, revision_count) of a message: its position among its siblings and how many there are."""
+        return self.sibling_index[message_id], len(self.children_index[self.parent_index[message_id]])
 
     # Python equivalent of findPathToNode
     def find_path_to_node(self, target_id):
-        # Helper function to recursively find the path
-        def search_path(node_id, local_path):
-            node = self.conv_messages_tree[node_id]  # Get the current node from the tree
-
-            # Add current node to the path
-            local_path.append(node)
+        """
+        Resolve the root-to-target path by walking parent pointers up from the target.
 
-            # If this is the target node, return the path
-            if node.get("id") == target_id:
-                return local_path
-
-            # If the node has children, search each child recursively
-            if node["children"]:
-                for child in node["children"]:
-                    result = search_path(child["id"], local_path.copy())  # Create a new path for each recursion
-                    if result:
-                        return result  # Return the found path
-
-            # If the node is not found in this path, return None
+        Runs in O(depth) without recursion or intermediate list copies. Returns None when the
+        target is not part of the tree, or when its ancestry is broken or cyclic.
+        """
+        self.conv_messages = []  # Resetting the conv_messages list as in the original
+        if target_id not in self.parent_index:
             return None
 
         path = []
-        path = search_path(0, path)
-        self.conv_messages = []  # Resetting the conv_messages list as in the original
+        node_id = target_id
+        while node_id:
+            if node_id not in self.parent_index or len(path) > len(self.parent_index):
+                return None
+            path.append(self.conv_messages_tree[node_id])
+            node_id = self.parent_index[node_id]
+
+        path.reverse()
         return path
 
     def process_conversation_tree(self, current_node, first_revision):
         while current_node is not None:
-            if not self.conv_messages_tree[current_node]["children"]:
+            children = self.children_index.get(current_node)
+            if not children:
                 break
-            message = self.conv_messages_tree[current_node]["children"][first_revision - 1]
+            message = children[first_revision - 1]
 
             # Add user message to conversation messages
-            self.conv_messages.append({
-                "id": message["id"],
-                "role": message["role"].value,
-                "content": message["content"],
-                "displayText": message["display_text"],
-                "conversationId": self.current_conv_thread_id,
-                "parentId": message["parent_message_id"],
-                "isJson": message["is_json"],
-                "questionConfig": message["question_config"],
-                "isDisliked": message["is_disliked"],
-                "prompt_details": message["prompt_details"] if "prompt_details" in message else {}
-            })
-            current_node = message["id"]
+            self.conv_messages.append(message)
+            current_node = message.id
             first_revision = 1
 
     def process_conversation_message(self, conv_messages):
-        for message in conv_messages:
-            if 'id' not in message:
-                continue
-            self.conv_messages.append({
-                "id": message["id"],
-                "role": message["role"].value,
-                "content": message["content"],
-                "displayText": message["display_text"],
-                "conversationId": self.current_conv_thread_id,
-                "parentId": message["parent_message_id"],
-                "isJson": message["is_json"],
-                "questionConfig": message["question_config"],
-                "isDisliked": message["is_disliked"],
-                "prompt_details": message["prompt_details"] if "prompt_details" in message else {}
-            })
+        self.conv_messages.extend(conv_messages)
@@ -1,16 +1,27 @@
 import uuid
+from typing import Optional
 
-from fastapi import Depends, Path, Query
+from fastapi import Depends, Header, HTTPException, Path, Query
+from starlette.responses import Response
 from fex_utilities.threads.serializers import CreateThreadRequest, CreateMessageRequest
 from fex_utilities.threads.services import ThreadService
 
-from threads.serializers import ThreadQueryParams
-from threads.utils import get_current_thread_messages
+from threads.cache import conversation_path_cache, thread_version
+from threads.exceptions import InvalidRevisionException
+from threads.dao import ConversationPathDao, ThreadActivePathDao, ThreadListDao, ThreadMessageDao, ThreadSearchDao, THREAD_IDENTITY
+from threads.pagination import decode_thread_cursor, encode_thread_cursor
+from threads.serializers import ThreadQueryParams, BatchThreadMessagesRequest, ThreadCursorQueryParams, \
+    ThreadMessageWindowParams, ThreadRevisionParams, ThreadSearchParams, BulkThreadMessagesRequest
+from threads.records import serialize_thread_messages, serialize_thread
+from threads.utils import get_current_thread_path, get_threads_current_paths, get_thread_message_window, \
+    revision_path_operation
 from utils.base_view import BaseView
 from utils.common import UserData, UserDataHandler
 from utils.connection_handler import ConnectionHandler, get_connection_handler_for_app, \
     get_read_connection_handler_for_app
-from threads.services import ThreadOwnershipService
+from utils.http_cache import build_etag, etag_matches, not_modified_response, set_etag
+from utils.sqlalchemy import get_current_time
+from threads.services import ThreadOwnershipService, ThreadMessageImportService
 
 THREAD_UUID_DESCRIPTION = "Thread UUID for which we are performing action"
 
@@ -25,6 +36,21 @@ async def check_thread_ownership(
     return await ownership_service.check_ownership(thread_id, user_data)
 
 
+# Read-side ownership check. The thread row is loaded from the primary, since a lagging replica could
+# reject a thread created a moment ago or hand out a stale last_message_id (and ETag). FastAPI caches
+# dependencies per request, so the view receives the same read handler and finds the checked thread
+# in its identity map; only the message reads go to the replica
+async def check_thread_ownership_for_read(
+    thread_id: uuid.UUID = Path(description=THREAD_UUID_DESCRIPTION),
+    user_data: UserData = Depends(UserDataHandler.get_user_data_from_request),
+    primary_connection_handler: ConnectionHandler = Depends(get_connection_handler_for_app),
+    connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app)
+):
+    ownership_service = ThreadOwnershipService(primary_connection_handler)
+    thread = await ownership_service.check_ownership(thread_id, user_data)
+    connection_handler.remember(THREAD_IDENTITY, thread_id, thread)
+    return thread
+
 
 class ThreadView(BaseView):
     SUCCESS_MESSAGE_THREAD_CREATED = "New Chat Thread Created!"
@@ -60,7 +86,9 @@ class ThreadView(BaseView):
         try:
             thread_service = cls._get_thread_service(connection_handler)
             await cls._soft_delete_thread(thread_service, thread_id)
+            await cls._delete_active_path(connection_handler, thread_id)
             await connection_handler.session.commit()
+            conversation_path_cache.invalidate_thread(thread_id)
             return cls.construct_success_response(data={'thread_uuid': thread_id})
         except Exception as e:
             await connection_handler.session.rollback()
@@ -108,7 +136,9 @@ class ThreadView(BaseView):
         try:
             thread_service = cls._get_thread_service(connection_handler)
             await cls._soft_delete_thread(thread_service, thread_id)
+            await cls._delete_active_path(connection_handler, thread_id)
             await connection_handler.session.commit()
+            conversation_path_cache.invalidate_thread(thread_id)
             return cls.construct_success_response(data={'thread_uuid': thread_id})
         except Exception as exp:
             await connection_handler.session.rollback()
@@ -118,14 +148,20 @@ class ThreadView(BaseView):
     @classmethod
     async def get_v2(
             cls,
+            response: Response,
             thread_query_params: ThreadQueryParams = Depends(),
             user_data: UserData = Depends(UserDataHandler.get_user_data_from_request),
-            connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app)
+            connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app),
+            if_none_match: Optional[str] = Header(None)
     ):
         UserDataHandler.validate_email_match(user_email=user_data.email, requested_by=thread_query_params.user_email)
         try:
+            etag = await cls._get_threads_etag(connection_handler, thread_query_params, "get_v2")
+            if etag_matches(if_none_match, etag):
+                return not_modified_response(etag)
             thread_service = cls._get_thread_service(connection_handler)
             chat_threads = await cls._fetch_threads(thread_service, thread_query_params)
+            set_etag(response, etag)
             return cls.construct_success_response(data={'threads': chat_threads.get("threads", [])})
         except Exception as exp:
             return cls.construct_error_response(exp)
@@ -133,18 +169,64 @@ class ThreadView(BaseView):
     @classmethod
     async def get_v3(
             cls,
+            response: Response,
             thread_query_params: ThreadQueryParams = Depends(),
             user_data: UserData = Depends(UserDataHandler.get_user_data_from_request),
-            connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app)
+            connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app),
+            if_none_match: Optional[str] = Header(None)
     ):
         UserDataHandler.validate_email_match(user_email=user_data.email, requested_by=thread_query_params.user_email)
         try:
+            etag = await cls._get_threads_etag(connection_handler, thread_query_params, "get_v3")
+            if etag_matches(if_none_match, etag):
+                return not_modified_response(etag)
             thread_service = cls._get_thread_service(connection_handler)
             chat_threads = await cls._fetch_threads(thread_service, thread_query_params)
+            set_etag(response, etag)
             return cls.construct_success_response(data=chat_threads)
         except Exception as exp:
             return cls.construct_error_response(exp)
 
+    @classmethod
+    async def get_v4(
+            cls,
+            thread_query_params: ThreadCursorQueryParams = Depends(),
+            user_data: UserData = Depends(UserDataHandler.get_user_data_from_request),
+            connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app)
+    ):
+        UserDataHandler.validate_email_match(user_email=user_data.email, requested_by=thread_query_params.user_email)
+        after = decode_thread_cursor(thread_query_params.cursor)
+        try:
+            chat_threads = await cls._fetch_threads_page(connection_handler, thread_query_params, after)
+            return cls.construct_success_response(data=chat_threads)
+        except Exception as exp:
+            return cls.construct_error_response(exp, code=cls.ERROR_CODE_GET_THREADS)
+
+    @staticmethod
+    async def _get_threads_etag(connection_handler, thread_query_params, version):
+        thread_list_dao = ThreadListDao(session=connection_handler.session)
+        threads_version = await thread_list_dao.get_threads_version(
+            user_email=thread_query_params.user_email,
+            product=thread_query_params.product
+        )
+        return build_etag(version, *threads_version, *thread_query_params.dict().values())
+
+    @staticmethod
+    async def _fetch_threads_page(connection_handler, thread_query_params, after):
+        thread_list_dao = ThreadListDao(session=connection_handler.session)
+        # Fetch one extra row to learn whether another page exists
+        threads = await thread_list_dao.list_threads_by_activity(
+            user_email=thread_query_params.user_email,
+            product=thread_query_params.product,
+            limit=thread_query_params.page_size + 1,
+            after=after
+        )
+        page = threads[:thread_query_params.page_size]
+        next_cursor = None
+        if len(threads) > thread_query_params.page_size:
+            next_cursor = encode_thread_cursor(page[-1].updated_at, page[-1].id)
+        return {'threads': [serialize_thread(thread) for thread in page], 'next_cursor': next_cursor}
+
     @staticmethod
     async def _fetch_threads(thread_service, thread_query_params):
         return await thread_service.get_threads_with_pagination(
@@ -168,6 +250,11 @@ class ThreadView(BaseView):
     async def _soft_delete_thread(thread_service, thread_id):
         await thread_service.soft_delete_thread(thread_id)
 
+    @staticmethod
+    async def _delete_active_path(connection_handler, thread_id):
+        # Deleted threads are never read through the snapshot again
+        await ThreadActivePathDao(session=connection_handler.session).delete_active_path(thread_id)
+
     @staticmethod
     async def _list_threads_by_email(thread_service, user_email, product):
         return await thread_service.list_threads_by_email(user_email, product=product)
@@ -180,12 +267,15 @@ class ThreadMessageView(BaseView):
             create_message_request: CreateMessageRequest,
             connection_handler: ConnectionHandler = Depends(get_connection_handler_for_app)
     ):
+        ownership_service = ThreadOwnershipService(connection_handler)
+        await ownership_service.check_email_ownership(create_message_request.thread_id,
+                                                      create_message_request.requested_by)
         try:
-            thread_service = cls._get_thread_service(connection_handler)
-            thread_message = await cls._create_thread_message(thread_service, create_message_request)
-            await connection_handler.session.commit()
-            await cls._update_thread_last_message(thread_service, create_message_request.thread_id, thread_message.id)
+            thread_message = await cls._create_thread_message_and_advance_thread(
+                connection_handler, create_message_request
+            )
             await connection_handler.session.commit()
+            conversation_path_cache.invalidate_thread(create_message_request.thread_id)
             return cls.construct_success_response(data={'thread_message': thread_message})
         except Exception as exp:
             await connection_handler.session.rollback()
@@ -201,7 +291,10 @@ class ThreadMessageView(BaseView):
         try:
             thread_service = cls._get_thread_service(connection_handler)
             thread_message = await cls._update_thread_message(thread_service, thread_id, update_message_request)
+            await cls._touch_thread(thread_service, thread_id)
+            await cls._refresh_active_path(connection_handler, thread_id)
             await connection_handler.session.commit()
+            conversation_path_cache.invalidate_thread(thread_id)
             return cls.construct_success_response(data={'thread_message': thread_message})
         except Exception as exp:
             await connection_handler.session.rollback()
@@ -244,12 +337,14 @@ class ThreadMessageView(BaseView):
             connection_handler: ConnectionHandler = Depends(get_connection_handler_for_app)
     ):
         UserDataHandler.validate_email_match(user_email=user_data.email, requested_by=create_message_request.requested_by)
+        ownership_service = ThreadOwnershipService(connection_handler)
+        await ownership_service.check_ownership(create_message_request.thread_id, user_data)
         try:
-            thread_service = cls._get_thread_service(connection_handler)
-            thread_message = await cls._create_thread_message(thread_service, create_message_request)
-            await connection_handler.session.commit()
-            await cls._update_thread_last_message(thread_service, create_message_request.thread_id, thread_message.id)
+            thread_message = await cls._create_thread_message_and_advance_thread(
+                connection_handler, create_message_request
+            )
             await connection_handler.session.commit()
+            conversation_path_cache.invalidate_thread(create_message_request.thread_id)
             return cls.construct_success_response(data={'thread_message': thread_message})
         except Exception as exp:
             await connection_handler.session.rollback()
@@ -267,7 +362,10 @@ class ThreadMessageView(BaseView):
         try:
             thread_service = cls._get_thread_service(connection_handler)
             thread_message = await cls._update_thread_message(thread_service, thread_id, update_message_request)
+            await cls._touch_thread(thread_service, thread_id)
+            await cls._refresh_active_path(connection_handler, thread_id)
             await connection_handler.session.commit()
+            conversation_path_cache.invalidate_thread(thread_id)
             return cls.construct_success_response(data={'thread_message': thread_message})
         except Exception as exp:
             await connection_handler.session.rollback()
@@ -276,31 +374,31 @@ class ThreadMessageView(BaseView):
     @classmethod
     async def get_v2(
             cls,
+            response: Response,
             thread_id: uuid.UUID = Path(description=THREAD_UUID_DESCRIPTION),
-            thread: object = Depends(check_thread_ownership),
+            thread: object = Depends(check_thread_ownership_for_read),
             connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app),
-            last_message_id: int = None
+            primary_connection_handler: ConnectionHandler = Depends(get_connection_handler_for_app),
+            last_message_id: int = None,
+            if_none_match: Optional[str] = Header(None)
     ):
+        etag = cls._get_thread_messages_etag(thread, "get_v2", last_message_id)
+        if etag_matches(if_none_match, etag):
+            return not_modified_response(etag)
         try:
+            caught_up_handler = await cls._get_caught_up_handler([thread], connection_handler,
+                                                                 primary_connection_handler)
             if last_message_id:
-                thread_messages = await get_current_thread_messages(thread_id=thread_id, last_message_id=last_message_id)
-                for index, message in enumerate(thread_messages):
-                    thread_messages[index] = {
-                        "id": message["id"],
-                        "role": message["role"],
-                        "content": message["content"],
-                        "display_text": message["displayText"],
-                        "thread_uuid": thread_id,
-                        "parent_message_id": message["parentId"],
-                        "is_json": message["isJson"],
-                        "question_config": message["questionConfig"],
-                        "is_disliked": message["isDisliked"],
-                        "prompt_details": message["prompt_details"] if "prompt_details" in message else {}
-                    }
+                thread_messages = serialize_thread_messages(
+                    await get_current_thread_path(thread_id=thread_id, last_message_id=last_message_id,
+                                                  connection_handler=caught_up_handler),
+                    thread_id
+                )
             else:
-                thread_service = ThreadService(connection_handler=connection_handler)
+                thread_service = ThreadService(connection_handler=caught_up_handler)
                 thread_messages = await thread_service.get_thread_messages(thread_id)
 
+            set_etag(response, etag)
             return cls.construct_success_response(data={'thread_messages': thread_messages})
         except Exception as exp:
             return cls.construct_error_response(exp)
@@ -308,31 +406,143 @@ class ThreadMessageView(BaseView):
     @classmethod
     async def get_v3(
             cls,
+            response: Response,
             thread_id: uuid.UUID = Path(description=THREAD_UUID_DESCRIPTION),
-            thread: object = Depends(check_thread_ownership),
-            last_message_id: int = None
+            thread: object = Depends(check_thread_ownership_for_read),
+            connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app),
+            primary_connection_handler: ConnectionHandler = Depends(get_connection_handler_for_app),
+            last_message_id: int = None,
+            if_none_match: Optional[str] = Header(None)
     ):
+        etag = cls._get_thread_messages_etag(thread, "get_v3", last_message_id)
+        if etag_matches(if_none_match, etag):
+            return not_modified_response(etag)
         try:
-            thread_messages = await get_current_thread_messages(thread_id=thread_id,
-                                                                last_message_id=last_message_id)
-            for index, message in enumerate(thread_messages):
-                thread_messages[index] = {
-                    "id": message["id"],
-                    "role": message["role"],
-                    "content": message["content"],
-                    "display_text": message["displayText"],
-                    "thread_uuid": thread_id,
-                    "parent_message_id": message["parentId"],
-                    "is_json": message["isJson"],
-                    "question_config": message["questionConfig"],
-                    "is_disliked": message["isDisliked"],
-                    "prompt_details": message["prompt_details"] if "prompt_details" in message else {}
-                }
-
+            path = await get_current_thread_path(
+                thread_id=thread_id, last_message_id=last_message_id,
+                connection_handler=await cls._get_caught_up_handler([thread], connection_handler,
+                                                                    primary_connection_handler)
+            )
+            thread_messages = serialize_thread_messages(path, thread_id)
+
+            set_etag(response, etag)
             return cls.construct_success_response(data={'thread_messages': thread_messages})
         except Exception as exp:
             return cls.construct_error_response(exp)
 
+    @classmethod
+    async def get_v4(
+            cls,
+            thread_id: uuid.UUID = Path(description=THREAD_UUID_DESCRIPTION),
+            window_params: ThreadMessageWindowParams = Depends(),
+            thread: object = Depends(check_thread_ownership_for_read),
+            connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app)
+    ):
+        try:
+            window, next_cursor = await get_thread_message_window(
+                thread_id=thread_id,
+                leaf_message_id=window_params.cursor or window_params.last_message_id,
+                limit=window_params.limit,
+                connection_handler=connection_handler
+            )
+            return cls.construct_success_response(data={
+                'thread_messages': serialize_thread_messages(window, thread_id),
+                'next_cursor': next_cursor
+            })
+        except Exception as exp:
+            return cls.construct_error_response(exp)
+
+    @classmethod
+    async def get_revisions_v4(
+            cls,
+            thread_id: uuid.UUID = Path(description=THREAD_UUID_DESCRIPTION),
+            revision_params: ThreadRevisionParams = Depends(),
+            thread: object = Depends(check_thread_ownership_for_read),
+            connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app),
+            primary_connection_handler: ConnectionHandler = Depends(get_connection_handler_for_app)
+    ):
+        try:
+            annotated_path = await revision_path_operation(
+                await cls._get_caught_up_handler([thread], connection_handler, primary_connection_handler),
+                thread_id,
+                leaf_message_id=revision_params.last_message_id,
+                node_id=revision_params.node_id,
+                revision=revision_params.revision
+            )
+            thread_messages = []
+            for record, revision, revision_count in annotated_path:
+                thread_message = record.to_thread_message(thread_id)
+                thread_message["revision"] = revision
+                thread_message["revision_count"] = revision_count
+                thread_messages.append(thread_message)
+
+            return cls.construct_success_response(data={
+                'thread_messages': thread_messages,
+                'last_message_id': thread_messages[-1]["id"] if thread_messages else None
+            })
+        except InvalidRevisionException:
+            # Left to the router, which answers ApiExceptions with a 400 carrying their message
+            raise
+        except Exception as exp:
+            return cls.construct_error_response(exp)
+
+    @classmethod
+    async def bulk_post_v3(
+            cls,
+            bulk_request: BulkThreadMessagesRequest,
+            user_data: UserData = Depends(UserDataHandler.get_user_data_from_request),
+            connection_handler: ConnectionHandler = Depends(get_connection_handler_for_app)
+    ):
+        UserDataHandler.validate_email_match(user_email=user_data.email, requested_by=bulk_request.requested_by)
+        thread_ids = [thread.thread_id for thread in bulk_request.threads]
+        if len(set(thread_ids)) != len(thread_ids):
+            raise HTTPException(status_code=400, detail="Each thread can appear only once per import.")
+        ownership_service = ThreadOwnershipService(connection_handler)
+        await ownership_service.check_ownership_many(thread_ids, user_data)
+        # Rejected imports raise before the try, so the router answers them with a 400 carrying the reason
+        import_service = ThreadMessageImportService(connection_handler)
+        ordered_threads = await import_service.validate_threads(bulk_request.threads)
+        try:
+            imported_ids = await import_service.import_threads(ordered_threads, user_id=user_data.userId)
+            await connection_handler.session.commit()
+            for thread_id in thread_ids:
+                conversation_path_cache.invalidate_thread(thread_id)
+            return cls.construct_success_response(data={'threads': imported_ids},
+                                                  message=ThreadView.SUCCESS_MESSAGE_THREAD_MESSAGE)
+        except Exception as exp:
+            await connection_handler.session.rollback()
+            return cls.construct_error_response(exp)
+
+    @classmethod
+    async def batch_get_v3(
+            cls,
+            batch_request: BatchThreadMessagesRequest,
+            user_data: UserData = Depends(UserDataHandler.get_user_data_from_request),
+            connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app),
+            primary_connection_handler: ConnectionHandler = Depends(get_connection_handler_for_app)
+    ):
+        thread_ids = list(dict.fromkeys(batch_request.thread_ids))
+        # Ownership and leaves come from the primary, as in check_thread_ownership_for_read
+        ownership_service = ThreadOwnershipService(primary_connection_handler)
+        threads = await ownership_service.check_ownership_many(thread_ids, user_data)
+        try:
+            threads_paths = await get_threads_current_paths(
+                [(thread.uuid, thread.last_message_id, thread_version(thread)) for thread in threads],
+                connection_handler=await cls._get_caught_up_handler(
+                    threads, connection_handler, primary_connection_handler
+                )
+            )
+            data = [
+                {
+                    'thread_uuid': thread_id,
+                    'thread_messages': serialize_thread_messages(threads_paths.get(str(thread_id), []), thread_id)
+                }
+                for thread_id in thread_ids
+            ]
+            return cls.construct_success_response(data={'threads': data})
+        except Exception as exp:
+            return cls.construct_error_response(exp)
+
     @classmethod
     async def search_messages_v2(
             cls,
@@ -350,11 +560,47 @@ class ThreadMessageView(BaseView):
         except Exception as exp:
             return cls.construct_error_response(exp)
 
+    @classmethod
+    async def search_messages_v3(
+            cls,
+            search_params: ThreadSearchParams = Depends(),
+            user_data: UserData = Depends(UserDataHandler.get_user_data_from_request),
+            connection_handler: ConnectionHandler = Depends(get_read_connection_handler_for_app)
+    ):
+        UserDataHandler.validate_email_match(user_email=user_data.email, requested_by=search_params.email)
+        try:
+            threads = await cls._search_threads_ranked(connection_handler, search_params)
+            return cls.construct_success_response(data={'threads': threads, 'page': search_params.page})
+        except Exception as exp:
+            return cls.construct_error_response(exp)
+
     # Static Methods
     @staticmethod
     def _get_thread_service(connection_handler):
         return ThreadService(connection_handler=connection_handler)
 
+    @staticmethod
+    async def _search_threads_ranked(connection_handler, search_params):
+        search_dao = ThreadSearchDao(session=connection_handler.session)
+        rows = await search_dao.search_threads(
+            query=search_params.query,
+            user_email=search_params.email,
+            product=search_params.product,
+            limit=search_params.page_size,
+            offset=(search_params.page - 1) * search_params.page_size
+        )
+        return [
+            {
+                "uuid": row.uuid,
+                "title": row.title,
+                "last_message_id": row.last_message_id,
+                "updated_at": row.updated_at,
+                "rank": row.rank,
+                "match_count": row.match_count
+            }
+            for row in rows
+        ]
+
     @staticmethod
     async def _create_thread_message(thread_service, create_message_request):
         return await thread_service.create_thread_message(
@@ -362,9 +608,58 @@ class ThreadMessageView(BaseView):
             user_email=create_message_request.requested_by,
         )
 
+    @classmethod
+    async def _create_thread_message_and_advance_thread(cls, connection_handler, create_message_request):
+        """
+        Insert the message and point thread.last_message_id at it inside one transaction.
+
+        The insert goes through ThreadService on a handler whose commits only flush, which still gives
+        the message its id, and the thread row is updated last so its row lock is held only until the
+        caller's single commit.
+        """
+        thread_service = cls._get_thread_service(connection_handler.deferring_commits())
+        thread_message = await cls._create_thread_message(thread_service, create_message_request)
+        message_dao = ThreadMessageDao(session=connection_handler.session)
+        await message_dao.set_thread_last_message(create_message_request.thread_id, thread_message.id)
+        await cls._advance_active_path(connection_handler, create_message_request.thread_id,
+                                       thread_message.parent_message_id, thread_message.id)
+        return thread_message
+
+    @staticmethod
+    async def _advance_active_path(connection_handler, thread_id, parent_message_id, message_id):
+        # Extending the current leaf is a cheap array append; a new branch recomputes the snapshot
+        active_path_dao = ThreadActivePathDao(session=connection_handler.session)
+        if not await active_path_dao.advance_active_path(thread_id, parent_message_id, message_id):
+            await active_path_dao.refresh_active_paths([thread_id])
+
+    @staticmethod
+    async def _refresh_active_path(connection_handler, thread_id):
+        await ThreadActivePathDao(session=connection_handler.session).refresh_active_paths([thread_id])
+
+    @staticmethod
+    async def _touch_thread(thread_service, thread_id):
+        # Bump the thread version so conversation ETags change when a message is edited
+        await thread_service.thread_dao.update_thread(thread_id, {"updated_at": get_current_time()})
+
+    @staticmethod
+    async def _get_caught_up_handler(threads, connection_handler, primary_connection_handler):
+        """
+        The read handler once it has replicated every thread at the version read on the primary, the
+        primary otherwise, so reads never pair a lagging replica's messages with the primary's thread rows.
+        """
+        if connection_handler.shares_database_with(primary_connection_handler):
+            return connection_handler
+        path_dao = ConversationPathDao(session=connection_handler.session)
+        replicated_versions = await path_dao.get_thread_versions([thread.uuid for thread in threads])
+        if all(replicated_versions.get(str(thread.uuid)) == thread_version(thread) for thread in threads):
+            return connection_handler
+        return primary_connection_handler
+
     @staticmethod
-    async def _update_thread_last_message(thread_service, thread_id, last_message_id):
-        await thread_service.thread_dao.update_thread(thread_id, {"last_message_id": last_message_id})
+    def _get_thread_messages_etag(thread, version, last_message_id):
+        # The thread version is also what cached paths are checked against, and what the handler
+        # the body is read from has caught up to, so the tag identifies the body it is sent with
+        return build_etag(version, thread.uuid, *thread_version(thread), last_message_id)
 
     @staticmethod
     async def _update_thread_message(thread_service, thread_id, update_message_request):
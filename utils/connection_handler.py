@@ -1,17 +1,37 @@
-from typing import Optional
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from config.logging import logger
 from config.settings import loaded_config
+from prometheus.metrics import READ_REPLICA_FALLBACKS
 from utils.kafka import AsyncEventEmitterWrapper
 
 
+class FlushOnCommitSession:
+    """Session proxy whose commit only flushes, so the writes of a service that commits itself join the caller's transaction."""
+
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    async def commit(self):
+        await self._session.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
 class ConnectionHandler:
 
-    def __init__(self, connection_manager=None, event_bridge=None):
-        self._session: Optional[AsyncSession] = None
+    def __init__(self, connection_manager=None, event_bridge=None, session: Optional[AsyncSession] = None):
+        # An already open session is used as is, instead of one from the connection manager
+        self._session: Optional[AsyncSession] = session
         self._connection_manager = connection_manager
         self._event_emitter: Optional[AsyncEventEmitterWrapper] = None
+        # Request-scoped identity map, lets dependencies hand already loaded rows to the view and services
+        self._identity_map: Dict[Tuple[str, Any], Any] = {}
 
     @property
     def session(self):
@@ -27,6 +47,23 @@ class ConnectionHandler:
             self._event_emitter = AsyncEventEmitterWrapper()
         return self._event_emitter
 
+    def shares_database_with(self, other: "ConnectionHandler") -> bool:
+        """Whether both handlers use the same connection manager, e.g. reads falling back to the primary."""
+        return self._connection_manager is other._connection_manager
+
+    def deferring_commits(self) -> "ConnectionHandler":
+        """Handler on this handler's session and identity map whose commits only flush; the caller commits once."""
+        connection_handler = ConnectionHandler(connection_manager=self._connection_manager)
+        connection_handler._session = FlushOnCommitSession(self.session)
+        connection_handler._identity_map = self._identity_map
+        return connection_handler
+
+    def remember(self, kind: str, key, obj):
+        self._identity_map[(kind, str(key))] = obj
+
+    def get_remembered(self, kind: str, key):
+        return self._identity_map.get((kind, str(key)))
+
     async def session_commit(self):
         await self.session.commit()
 
@@ -48,3 +85,86 @@ async def get_connection_handler_for_app():
         await connection_handler.close()
 
 
+
+
+class ReadReplicaHealth:
+    """
+    Decides whether reads may go to the replica: it must answer and be at most `max_lag_seconds` behind.
+
+    The verdict is cached for `check_interval` seconds and refreshed by a single request at a time,
+    so the probe costs one query per interval per worker rather than one per request.
+    """
+    PROBE_TIMEOUT_SECONDS = 2
+
+    def __init__(self, max_lag_seconds: float, check_interval: float):
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._usable = False
+        self._checked_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def is_usable(self, connection_manager) -> bool:
+        if self._is_fresh() or self._lock.locked():
+            return self._usable
+        async with self._lock:
+            if not self._is_fresh():
+                self._usable = await self._probe(connection_manager)
+                self._checked_at = time.monotonic()
+        return self._usable
+
+    def _is_fresh(self) -> bool:
+        return self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval
+
+    async def _probe(self, connection_manager) -> bool:
+        try:
+            lag = await asyncio.wait_for(connection_manager.get_replication_lag(), self.PROBE_TIMEOUT_SECONDS)
+        except Exception as exp:
+            logger.warning("Read replica unavailable, routing reads to primary: %s", str(exp))
+            return False
+        if lag > self.max_lag_seconds:
+            logger.warning("Read replica is %.1fs behind, routing reads to primary", lag)
+            return False
+        return True
+
+
+read_replica_health = ReadReplicaHealth(
+    max_lag_seconds=float(loaded_config.read_replica_max_lag_seconds),
+    check_interval=float(loaded_config.read_replica_health_check_interval)
+)
+
+
+async def get_read_connection_manager():
+    """The replica's connection manager when one is configured and healthy, the primary's otherwise."""
+    read_connection_manager = loaded_config.read_connection_manager
+    if read_connection_manager is None:
+        return loaded_config.connection_manager
+    if await read_replica_health.is_usable(read_connection_manager):
+        return read_connection_manager
+    READ_REPLICA_FALLBACKS.inc()
+    return loaded_config.connection_manager
+
+
+async def get_read_connection_handler_for_app():
+    connection_handler = ConnectionHandler(connection_manager=await get_read_connection_manager())
+    try:
+        yield connection_handler
+    finally:
+        await connection_handler.close()
+
+
+async def execute_db_operation(operation, *args, **kwargs):
+    """Run `operation(connection_handler, *args, **kwargs)` on its own primary connection and close it afterwards."""
+    connection_handler = ConnectionHandler(connection_manager=loaded_config.connection_manager)
+    try:
+        return await operation(connection_handler, *args, **kwargs)
+    finally:
+        await connection_handler.close()
+
+
+async def execute_read_db_operation(operation, *args, **kwargs):
+    """Run `operation(connection_handler, *args, **kwargs)` on its own read connection and close it afterwards."""
+    connection_handler = ConnectionHandler(connection_manager=await get_read_connection_manager())
+    try:
+        return await operation(connection_handler, *args, **kwargs)
+    finally:
+        await connection_handler.close()
@@ -1,5 +1,7 @@
 from asyncio import current_task
+from contextlib import asynccontextmanager
 
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, async_scoped_session, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
@@ -19,6 +21,38 @@ class ConnectionManager:
     def get_session_factory(self):
         return self._db_session_factory
 
+    async def get_replication_lag(self) -> float:
+        """
+        Seconds this database is behind its primary; 0 for a primary or a standby that has replayed all it received.
+
+        Comparing the received and replayed WAL positions keeps an idle primary from looking like lag.
+        """
+        async with self._db_engine.connect() as connection:
+            result = await connection.execute(text(
+                "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            ))
+            return float(result.scalar())
+
+    @asynccontextmanager
+    async def advisory_lock(self, key: int):
+        """
+        Yields whether the session-level advisory lock `key` was taken, without waiting for it.
+
+        The lock is held on a dedicated connection until the block exits, or until that connection
+        drops, so a crashed holder never leaves it taken. The connection runs in autocommit, so it
+        does not sit idle in a transaction while the lock is held.
+        """
+        async with self._db_engine.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            locked = (await connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})).scalar()
+            try:
+                yield locked
+            finally:
+                if locked:
+                    await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+
     # def get_redis_pool(self):
     #     return self._redis_pool
 
@@ -53,7 +53,7 @@ class BaseDao:
     async def get_by_pk(self, pk_value):
         return await self.session.get(self.db_model, pk_value)
 
-    async def bulk_insert(self, mappings):
+    async def bulk_insert(self, mappings, commit: bool = True):
         try:
             # self.session.bulk_insert_mappings(self.db_model, mappings)
             # self.session.commit()
@@ -63,7 +63,9 @@ class BaseDao:
             #     await session.commit()
 
             await self.session.run_sync(lambda ses: ses.bulk_insert_mappings(self.db_model, mappings))
-            await self.session.commit()
+            # Callers batching several writes into one transaction commit themselves
+            if commit:
+                await self.session.commit()
         except IntegrityError as e:
-            self.session.rollback()
+            await self.session.rollback()
             raise e
@@ -0,0 +1,34 @@
+import hashlib
+from typing import Optional
+
+from starlette.responses import Response
+
+
+def build_etag(*parts) -> str:
+    """Weak validator derived from the given version parts (ids, timestamps, request parameters)."""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode("utf-8"), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag, as required for GET requests."""
+    if not if_none_match:
+        return False
+    opaque_tag = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque_tag:
+            return True
+    return False
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    # Clients may keep the body but must revalidate before reusing it
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+def not_modified_response(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
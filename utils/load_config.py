@@ -1,4 +1,7 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
 from config.settings import loaded_config
+from threads.jobs import schedule_thread_purge
 from utils.connection_manager import ConnectionManager
 from utils.aiohttprequest import AioHttpRequest
 from spacy.cli import download
@@ -8,15 +11,21 @@ from spacy.cli import download
 async def run_on_startup():
     try:
         await init_connections()
-        # await init_scheduler()
+        await init_scheduler()
     except Exception as e:
         print(e)
 
 
 async def run_on_exit():
     await loaded_config.connection_manager.close_connections()
+    if loaded_config.read_connection_manager:
+        await loaded_config.read_connection_manager.close_connections()
     await loaded_config.aiohttp_request.close_session()
-    loaded_config.aps_scheduler.shutdown(wait=False)
+    if loaded_config.aps_scheduler:
+        loaded_config.aps_scheduler.shutdown(wait=False)
+    # Imported here so server startup does not load the vector_db package
+    from utils.vector_db.embeddings import close_embedding_generator
+    await close_embedding_generator()
 
 async def run_on_consumer_exit():
     await loaded_config.connection_manager.close_connections()
@@ -27,8 +36,19 @@ async def init_connections():
         db_echo=loaded_config.db_echo
     )
     loaded_config.connection_manager = connection_manager
+    if loaded_config.read_db_url:
+        loaded_config.read_connection_manager = ConnectionManager(
+            db_url=loaded_config.read_db_url,
+            db_echo=loaded_config.db_echo
+        )
     loaded_config.aiohttp_request = AioHttpRequest()
 
+async def init_scheduler():
+    scheduler = AsyncIOScheduler()
+    schedule_thread_purge(scheduler)
+    scheduler.start()
+    loaded_config.aps_scheduler = scheduler
+
 async def run_on_consumer_startup():
     try:
         await init_consumer_connections()
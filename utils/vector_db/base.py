@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 
 from code_indexing.serializers import VectorSearchRequest, KeywordSearchRequest
 from etl.serializers import QueryRequest
@@ -33,7 +33,20 @@ class VectorDBAdapter(ABC):
     async def get_documents_by_path(self, index_name: str, path: str, graph_id: str) -> List[Dict[str, Any]]:
         pass
 
-    async def delete_documents_by_path(self, index_name: str, path: str, graph_id: str) -> bool:
+    @abstractmethod
+    def iter_documents(self, index_name: str, query: Dict[str, Any], source: Optional[List[str]] = None,
+                       page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        pass
+
+    async def delete_documents_by_path(self, index_name: str, path: str, graph_id: str,
+                                       slices: Union[int, str, None] = None) -> bool:
+        pass
+
+    async def submit_delete_documents_by_path(self, index_name: str, path: str, graph_id: str,
+                                              slices: Union[int, str, None] = None) -> str:
+        pass
+
+    async def get_task_status(self, task_id: str) -> Dict[str, Any]:
         pass
 
     @abstractmethod
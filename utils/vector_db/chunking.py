@@ -0,0 +1,79 @@
+from functools import lru_cache
+from typing import Iterator, List
+
+import tiktoken
+
+TOKENIZER_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = TOKENIZER_ENCODING) -> tiktoken.Encoding:
+    """Loads a tokenizer once per process; tiktoken.get_encoding re-reads its registry on every call."""
+    return tiktoken.get_encoding(name)
+
+
+def chunk_tokens(text: str, token_limit: int, overlap: int = 0) -> List[str]:
+    """
+    Splits text into chunks of at most `token_limit` tokens, each sharing `overlap` tokens with the previous one.
+    - Encodes the text once; a text within the limit comes back as a single chunk.
+    - Module-level so it can run in a process pool.
+    """
+    if not 0 <= overlap < token_limit:
+        raise ValueError(f"Chunk overlap {overlap} must be between 0 and the token limit {token_limit}")
+    encoding = get_encoding()
+    tokens = encoding.encode(text)
+    step = token_limit - overlap
+    return [encoding.decode(tokens[start:start + token_limit])
+            for start in range(0, max(len(tokens) - overlap, 1), step)]
+
+
+def encode_text(text: str) -> List[int]:
+    """Tokens of `text`; module-level so large documents can be tokenized in a process pool."""
+    return get_encoding().encode(text)
+
+
+class TokenChunker:
+    """
+    Cuts a stream of token runs into the chunks chunk_tokens would cut their concatenation into.
+    - Chunks start every `token_limit - overlap` tokens of the whole stream, whatever the run boundaries.
+    - Tokens past the last full chunk are carried into the next run; `finish` flushes them.
+    """
+
+    def __init__(self, token_limit: int, overlap: int = 0):
+        if not 0 <= overlap < token_limit:
+            raise ValueError(f"Chunk overlap {overlap} must be between 0 and the token limit {token_limit}")
+        self.token_limit = token_limit
+        self.overlap = overlap
+        self._tokens: List[int] = []
+        self._chunked = False
+
+    def feed(self, tokens: List[int]) -> List[str]:
+        self._tokens.extend(tokens)
+        step = self.token_limit - self.overlap
+        starts = range(0, len(self._tokens) - self.token_limit + 1, step)
+        chunks = [get_encoding().decode(self._tokens[start:start + self.token_limit]) for start in starts]
+        if chunks:
+            self._chunked = True
+            del self._tokens[:starts[-1] + step]
+        return chunks
+
+    def finish(self) -> List[str]:
+        # Like chunk_tokens, an empty stream still gives one (empty) chunk
+        end = max(len(self._tokens) - self.overlap, 0 if self._chunked else 1)
+        chunks = [get_encoding().decode(self._tokens[start:start + self.token_limit])
+                  for start in range(0, end, self.token_limit - self.overlap)]
+        self._tokens = []
+        return chunks
+
+
+def split_segments(text: str, segment_chars: int) -> Iterator[str]:
+    """Cuts a large text into pieces of about `segment_chars`, on line boundaries where possible."""
+    start = 0
+    while start < len(text):
+        end = min(start + segment_chars, len(text))
+        if end < len(text):
+            newline = text.rfind("\n", start, end)
+            if newline > start:
+                end = newline + 1
+        yield text[start:end]
+        start = end
@@ -1,15 +1,21 @@
 from elasticsearch import AsyncElasticsearch
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 import asyncio
 
 from code_indexing.serializers import VectorSearchRequest, KeywordSearchRequest
 from etl.serializers import QueryRequest
 from .base import VectorDBAdapter
-from .embeddings import EmbeddingGenerator
+from .embeddings import get_embedding_generator
+from .folder_tree_cache import build_folder_tree, folder_tree_cache, slice_folder_tree
 from .exceptions import ConnectionError, SearchError
 from config.settings import loaded_config
 from elasticsearch.helpers import async_bulk
-import os
+
+# Submitted path deletions by task id: (index name, graph id, path) whose folder is dropped from the
+# folder tree cache once the task is seen to have completed cleanly
+_pending_path_deletions: "OrderedDict[str, Tuple[str, str, str]]" = OrderedDict()
+MAX_PENDING_PATH_DELETIONS = 1000
 
 class ElasticSearchAdapter(VectorDBAdapter):
     """Elasticsearch adapter for vector search operations."""
@@ -38,10 +44,12 @@ class ElasticSearchAdapter(VectorDBAdapter):
             }
         }
     }
+    # Reruns of a delete-by-query that left documents behind because they changed mid-deletion
+    DELETE_CONFLICT_RETRIES = 2
 
     def __init__(self):
         self.client = None
-        self.embedding_generator = EmbeddingGenerator(api_key=loaded_config.openai_gpt4o_api_key)
+        self.embedding_generator = get_embedding_generator()
 
     async def connect(self, retries=3, delay=2) -> None:
         """Connect to Elasticsearch with retries."""
@@ -72,19 +80,20 @@ class ElasticSearchAdapter(VectorDBAdapter):
 
     async def delete_index(self, index_name: str) -> Dict[str, Any]:
         try:
-            return await self.client.indices.delete(index=index_name)
+            response = await self.client.indices.delete(index=index_name)
+            folder_tree_cache.invalidate_index(index_name)
+            return response
         except Exception as e:
             raise SearchError(f"Failed to delete index: {str(e)}")
 
     async def index_document(self, index_name: str, document: Dict[str, Any]) -> Dict[str, Any]:
         try:
             # Generate vector embedding asynchronously
-            source_text = document.get("source_code", "")
-            document["description_vector"] = await asyncio.to_thread(
-                self.embedding_generator.generate_embedding, source_text
-            )
+            await self._embed_documents([document])
 
-            return await self.client.index(index=index_name, document=document)
+            response = await self.client.index(index=index_name, document=document)
+            self._track_files(index_name, [document])
+            return response
         except Exception as e:
             raise SearchError(f"Failed to index document: {str(e)}")
 
@@ -110,46 +119,166 @@ class ElasticSearchAdapter(VectorDBAdapter):
 
             # If source_code is in the update fields, generate a new vector embedding
             if "source_code" in update_fields:
-                update_fields["description_vector"] = await self.embedding_generator.generate_embedding(update_fields["source_code"])
+                update_fields["description_vector"] = await self.embedding_generator.generate_embedding_async(
+                    update_fields["source_code"]
+                )
 
             # Update the document with new fields
-            return await self.client.update(index=index_name, id=doc_id, body={"doc": update_fields})
+            response = await self.client.update(index=index_name, id=doc_id, body={"doc": update_fields})
+            # A partial update may change what the stored document is, so the graph's tree is reloaded
+            # rather than patched from the fields sent
+            folder_tree_cache.invalidate_graph(index_name, update_fields["graph_id"])
+            return response
         except Exception as e:
             raise SearchError(f"Failed to update document: {str(e)}")
 
     async def get_documents_by_path(self, index_name: str, path: str, graph_id: str) -> List[Dict[str, Any]]:
+        return [hit async for hit in self.iter_documents(index_name, self._path_prefix_query(path, graph_id))]
+
+    async def iter_documents(self, index_name: str, query: Dict[str, Any], source: Optional[List[str]] = None,
+                             page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields every hit matching `query`, one page at a time, with a point in time and `search_after`.
+        - The point in time pins a consistent view of the index for the whole walk, so concurrent
+          writes neither skip nor repeat hits; it is closed once iteration ends or is abandoned.
+        - `source` limits the `_source` fields returned; `page_size` defaults to elastic_page_size.
+        """
+        keep_alive = loaded_config.elastic_pit_keep_alive
         try:
-            query = {
-                "query": {
-                    "bool": {
-                        "must": [
-                            {"prefix": {"path": path}},
-                            {"term": {"graph_id": graph_id}}
-                        ]
-                    }
-                }
-            }
-            search_result = await self.client.search(index=index_name, body=query, size=1000)  # Fetch up to 1000 results
-            return search_result["hits"]["hits"]
+            pit = await self.client.open_point_in_time(index=index_name, keep_alive=keep_alive)
         except Exception as e:
             raise SearchError(f"Failed to fetch documents: {str(e)}")
 
-    async def delete_documents_by_path(self, index_name: str, path: str, graph_id: str) -> bool:
+        pit_id = pit["id"]
+        body = {
+            "query": query,
+            "size": page_size or loaded_config.elastic_page_size,
+            # _shard_doc is the cheapest total order over a point in time
+            "sort": [{"_shard_doc": "asc"}],
+            "track_total_hits": False
+        }
+        if source is not None:
+            body["_source"] = source
         try:
-            documents = await self.get_documents_by_path(index_name, path, graph_id)
-            if not documents:
-                return False  # No matching documents found
-
-            for doc in documents:
-                await self.client.delete(index=index_name, id=doc["_id"])
+            while True:
+                try:
+                    response = await self.client.search(body={**body, "pit": {"id": pit_id, "keep_alive": keep_alive}})
+                except Exception as e:
+                    raise SearchError(f"Failed to fetch documents: {str(e)}")
+                # Elasticsearch may hand back a new id for the same point in time
+                pit_id = response.get("pit_id", pit_id)
+                hits = response["hits"]["hits"]
+                for hit in hits:
+                    yield hit
+                if len(hits) < body["size"]:
+                    return
+                body["search_after"] = hits[-1]["sort"]
+        finally:
+            try:
+                await self.client.close_point_in_time(body={"id": pit_id})
+            except Exception as e:
+                # The point in time expires on its own after keep_alive
+                print(f"Failed to close point in time: {e}")
 
-            return True
+    async def delete_documents_by_path(self, index_name: str, path: str, graph_id: str,
+                                       slices: Union[int, str, None] = None) -> bool:
+        """
+        Deletes every document under `path` for the graph with a single delete-by-query request.
+        - `slices` splits the deletion across shards in parallel ("auto" lets Elasticsearch pick).
+        - Raises SearchError when documents are left behind; the folder tree cache is only updated
+          once every document is gone.
+        Returns False when nothing matched.
+        """
+        try:
+            response = await self._delete_by_query(
+                index_name, self._path_prefix_query(path, graph_id), slices, wait_for_completion=True
+            )
+            folder_tree_cache.remove_prefix(index_name, graph_id, path)
+            return response.get("deleted", 0) > 0
         except Exception as e:
             raise SearchError(f"Failed to delete documents: {str(e)}")
 
+    async def submit_delete_documents_by_path(self, index_name: str, path: str, graph_id: str,
+                                              slices: Union[int, str, None] = None) -> str:
+        """
+        Starts deleting every document under `path` as a background task, for folders too large to
+        wait on. Returns the task id to poll with `get_task_status`; the folder tree cache drops the
+        folder when a poll finds the task completed without failures or version conflicts.
+        """
+        try:
+            response = await self._delete_by_query(
+                index_name, self._path_prefix_query(path, graph_id), slices, wait_for_completion=False
+            )
+            _pending_path_deletions[response["task"]] = (index_name, graph_id, path)
+            while len(_pending_path_deletions) > MAX_PENDING_PATH_DELETIONS:
+                _pending_path_deletions.popitem(last=False)
+            return response["task"]
+        except Exception as e:
+            raise SearchError(f"Failed to submit document deletion: {str(e)}")
+
+    async def get_task_status(self, task_id: str) -> Dict[str, Any]:
+        """
+        Progress of a background task such as a submitted deletion.
+        `completed` is True once it finished; `status` carries the deleted/total counts so far.
+        """
+        try:
+            response = await self.client.tasks.get(task_id=task_id)
+        except Exception as e:
+            raise SearchError(f"Failed to fetch task status: {str(e)}")
+        completed = response.get("completed", False)
+        result = response.get("response", {})
+        failures = result.get("failures", [])
+        if completed and task_id in _pending_path_deletions:
+            index_name, graph_id, path = _pending_path_deletions.pop(task_id)
+            if not (response.get("error") or failures or result.get("version_conflicts", 0)):
+                folder_tree_cache.remove_prefix(index_name, graph_id, path)
+        return {
+            "completed": completed,
+            "status": response.get("task", {}).get("status", {}),
+            "error": response.get("error"),
+            "failures": failures
+        }
+
+    async def _delete_by_query(self, index_name: str, query: Dict[str, Any], slices: Union[int, str, None],
+                               wait_for_completion: bool) -> Dict[str, Any]:
+        """
+        Runs a delete-by-query. Documents changed mid-deletion are skipped rather than failing the
+        whole request; when waiting, the query is rerun for them up to DELETE_CONFLICT_RETRIES times,
+        and SearchError is raised if any failures or version conflicts remain. `deleted` then counts
+        the documents deleted by every run.
+        """
+        deleted = 0
+        for _ in range(self.DELETE_CONFLICT_RETRIES + 1):
+            response = await self.client.delete_by_query(
+                index=index_name,
+                body={"query": query},
+                conflicts="proceed",
+                refresh=True,
+                slices=slices or loaded_config.elastic_delete_slices,
+                wait_for_completion=wait_for_completion
+            )
+            if not wait_for_completion:
+                return response
+            if response.get("failures"):
+                raise SearchError(f"Delete by query failed: {response['failures']}")
+            deleted += response.get("deleted", 0)
+            if not response.get("version_conflicts", 0):
+                return {**response, "deleted": deleted}
+        raise SearchError(f"Delete by query left {response['version_conflicts']} documents after version conflicts")
+
+    @staticmethod
+    def _path_prefix_query(path: str, graph_id: str) -> Dict[str, Any]:
+        return {
+            "bool": {
+                "must": [
+                    {"prefix": {"path": path}},
+                    {"term": {"graph_id": graph_id}}
+                ]
+            }
+        }
 
     async def search(self, index_name: str, query: str, size: int = 5) -> Dict[str, Any]:
-        query_vector = await self.embedding_generator.generate_embedding(query)
+        query_vector = await self.embedding_generator.generate_embedding_async(query)
         search_query = {
             "size": size,
             "query": {
@@ -225,7 +354,7 @@ class ElasticSearchAdapter(VectorDBAdapter):
                 return {"hits": {"total": 0, "hits": []}}
 
             # Generate query vector asynchronously
-            query_vector = await asyncio.to_thread(self.embedding_generator.generate_embedding, request.query)
+            query_vector = await self.embedding_generator.generate_embedding_async(request.query)
 
             # Dynamically set num_candidates based on max_results
             if request.max_results <= 10:
@@ -273,6 +402,9 @@ class ElasticSearchAdapter(VectorDBAdapter):
 
         await self.create_index(index_name=index_name, settings=mapping)
 
+        # Embed every action that carries source code but no vector yet, in batched requests
+        await self._embed_documents([action.get("_source", action) for action in actions])
+
         # Perform bulk indexing asynchronously
         success, failed = await async_bulk(self.client, actions, raise_on_error=False)
         print(f"Bulk insert completed: {success} succeeded, {failed} failed")
@@ -281,8 +413,31 @@ class ElasticSearchAdapter(VectorDBAdapter):
         failed_ids = [failure['index']['_id'] for failure in failed if 'index' in failure]
         print(f"Failed _ids: {failed_ids}")
 
+        failed_id_set = set(failed_ids)
+        self._track_files(index_name, [action.get("_source", action) for action in actions
+                                       if action.get("_id") is None or action.get("_id") not in failed_id_set])
+
         return {"success": success, "failed": failed_ids}
 
+    @staticmethod
+    def _track_files(index_name: str, documents: List[Dict[str, Any]]) -> None:
+        """Adds the file documents just written to the cached folder trees of their graphs."""
+        paths_by_graph = {}
+        for doc in documents:
+            if doc.get("type") == "file" and doc.get("path") and doc.get("graph_id"):
+                paths_by_graph.setdefault(doc["graph_id"], []).append(doc["path"])
+        for graph_id, paths in paths_by_graph.items():
+            folder_tree_cache.add_paths(index_name, graph_id, paths)
+
+    async def _embed_documents(self, documents: List[Dict[str, Any]]) -> None:
+        """Sets `description_vector` from `source_code` on the documents missing one, using batched embedding calls."""
+        pending = [doc for doc in documents if "description_vector" not in doc and doc.get("source_code")]
+        if not pending:
+            return
+        embeddings = await self.embedding_generator.generate_embeddings_async([doc["source_code"] for doc in pending])
+        for doc, embedding in zip(pending, embeddings):
+            doc["description_vector"] = embedding
+
     async def search_and_fetch_content_xml(self, request: QueryRequest, index_name: str, source_str: str) -> List[dict]:
         """
         Perform a search query on Elasticsearch and return the entire document,
@@ -290,7 +445,7 @@ class ElasticSearchAdapter(VectorDBAdapter):
         """
         try:
             # Generate query embedding
-            query_vector = await asyncio.to_thread(self.embedding_generator.generate_embedding, request.query)
+            query_vector = await self.embedding_generator.generate_embedding_async(request.query)
 
             if len(query_vector) != 1536:
                 raise ValueError(f"Query vector has incorrect dimensions: {len(query_vector)} (Expected: 1536)")
@@ -355,19 +510,16 @@ class ElasticSearchAdapter(VectorDBAdapter):
         Deletes all documents in the given Elasticsearch index where the `source` matches `source_str`.
         """
         try:
-            # Elasticsearch delete-by-query request
-            delete_query = {
-                "query": {
-                    "term": {"source": source_str}
-                }
-            }
-
             # Execute delete-by-query operation
-            response = await self.client.delete_by_query(index=index_name, body=delete_query)
+            response = await self._delete_by_query(
+                index_name, {"term": {"source": source_str}}, None, wait_for_completion=True
+            )
 
             # Debugging: Print response if needed
             print(response)
 
+            # Source documents carry no graph_id, so drop every tree cached for the index
+            folder_tree_cache.invalidate_index(index_name)
             return response
 
         except Exception as e:
@@ -404,31 +556,29 @@ class ElasticSearchAdapter(VectorDBAdapter):
 
     async def get_folder_structure(self, index_name: str, graph_id: str, level: int = None) -> Dict[str, Any]:
         """
-        Fetches folder structure for a given graph_id from Elasticsearch.
+        Fetches folder structure for a given graph_id, from the cached snapshot when there is one.
+        `version` changes whenever the graph's files change, so clients can skip unchanged trees.
         """
         try:
-            query = {
-                "query": {
+            snapshot = folder_tree_cache.get(index_name, graph_id)
+            if snapshot is None:
+                loaded_at = folder_tree_cache.write_sequence
+                query = {
                     "bool": {
                         "must": [
                             {"term": {"graph_id": graph_id}},
                             {"term": {"type": "file"}}
                         ]
                     }
-                },
-                "_source": ["path"],
-                "size": 10000  # Adjust based on expected file count
-            }
+                }
 
-            response = await self.client.search(index=index_name, body=query)
+                files = [hit["_source"]["path"] async for hit in self.iter_documents(index_name, query, source=["path"])]
+                snapshot = folder_tree_cache.set(index_name, graph_id, files, loaded_at)
 
-            if response["hits"]["total"]["value"] == 0:
+            if not snapshot.paths:
                 return {"success": False, "message": "No files found for this graph_id"}
 
-            files = [hit["_source"]["path"] for hit in response["hits"]["hits"]]
-            folder_tree = self._build_folder_structure(files, level)
-
-            return {"success": True, "data": folder_tree}
+            return {"success": True, "data": snapshot.tree(level), "version": snapshot.version}
 
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -442,29 +592,5 @@ class ElasticSearchAdapter(VectorDBAdapter):
         - `level=0`: Only top-level folders/files.
         - `level=1`: Include first level of subfolders.
         """
-        folder_tree = {}
-
-        # Extract common base path
-        common_prefix = os.path.commonpath(file_paths)
-
-        for file_path in file_paths:
-            # Convert absolute to relative path
-            rel_path = os.path.relpath(file_path, common_prefix)
-            parts = rel_path.split(os.sep)
-
-            # Limit depth based on level
-            if level is not None and len(parts) > level + 1:
-                parts = parts[: level + 1]  # Trim the path to the required depth
-
-            current = folder_tree
-            for i, part in enumerate(parts):
-                # If it's the last part and it's a file, store it directly
-                if i == len(parts) - 1 and "." in part:
-                    current[part] = file_path  # Store the full path for files
-                else:
-                    # If it's a folder, ensure it exists
-                    if part not in current:
-                        current[part] = {}
-                    current = current[part]
-
-        return folder_tree
+        _, folder_tree = build_folder_tree(file_paths)
+        return folder_tree if level is None else slice_folder_tree(folder_tree, level)
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+from config.logging import logger
+from config.settings import loaded_config
+from prometheus.metrics import EMBEDDING_CACHE_HITS, EMBEDDING_CACHE_MISSES
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings keyed by sha256 of (model, text).
+
+    Two tiers: an in-process LRU of up to `max_entries` vectors and a local SQLite file that survives
+    restarts. Vectors are kept as float32 arrays, a quarter of the size of a list of Python floats.
+    The file keeps at most `max_disk_entries` rows: once a write goes past it, the rows written
+    longest ago are deleted. The disk tier is best-effort, so SQLite errors are logged and treated
+    as misses or skipped writes. Safe to use from the worker threads embedding calls run on.
+    """
+
+    def __init__(self, max_entries: int, path: str, max_disk_entries: int, enabled: bool = True):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        # Rows in the file, counted on connect and grown by each write until the next prune
+        self._disk_rows = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vectors for `texts`, None where missing; disk hits are promoted to memory."""
+        if not self.enabled:
+            return [None] * len(texts)
+
+        keys = [self.make_key(model, text) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+            EMBEDDING_CACHE_HITS.labels(tier="memory").inc(len(found))
+
+            missing = [key for key in set(keys) if key not in found]
+            if missing:
+                try:
+                    rows = list(self._read_rows(missing))
+                except (sqlite3.Error, OSError) as exp:
+                    logger.error("Embedding cache read failed: %s", str(exp))
+                    rows = []
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector
+                    self._remember(key, vector)
+                    EMBEDDING_CACHE_HITS.labels(tier="disk").inc()
+
+        EMBEDDING_CACHE_MISSES.inc(sum(1 for key in keys if key not in found))
+        return [found[key].tolist() if key in found else None for key in keys]
+
+    def set_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        if not self.enabled:
+            return
+        rows = []
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.make_key(model, text)
+                vector = array("f", embedding)
+                self._remember(key, vector)
+                rows.append((key, model, vector.tobytes()))
+            try:
+                connection = self._get_connection()
+                # A replaced row gets a new rowid, so rowid order is write order
+                connection.executemany("INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows)
+                connection.commit()
+                self._disk_rows += len(rows)
+                if self._disk_rows > self.max_disk_entries:
+                    self._prune(connection)
+            except (sqlite3.Error, OSError) as exp:
+                logger.error("Embedding cache write failed: %s", str(exp))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            try:
+                connection = self._get_connection()
+                connection.execute("DELETE FROM embeddings")
+                connection.commit()
+                self._disk_rows = 0
+            except (sqlite3.Error, OSError) as exp:
+                logger.error("Embedding cache clear failed: %s", str(exp))
+
+    def _remember(self, key: str, vector: array):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune(self, connection: sqlite3.Connection):
+        """Delete the rows written longest ago, down to `max_disk_entries`."""
+        self._disk_rows = connection.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+        excess = self._disk_rows - self.max_disk_entries
+        if excess > 0:
+            connection.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)", (excess,)
+            )
+            connection.commit()
+            self._disk_rows -= excess
+
+    def _read_rows(self, keys: List[str]):
+        connection = self._get_connection()
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ", ".join("?" * len(batch))
+            yield from connection.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Access is serialized by self._lock, so the connection may be shared across threads
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+                )
+                self._disk_rows = connection.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+            except sqlite3.Error:
+                connection.close()
+                raise
+            self._connection = connection
+        return self._connection
+
+
+embedding_cache = EmbeddingCache(
+    max_entries=loaded_config.embedding_cache_max_entries,
+    path=loaded_config.embedding_cache_path,
+    max_disk_entries=loaded_config.embedding_cache_max_disk_entries,
+    enabled=loaded_config.embedding_cache_enabled
+)
@@ -1,55 +1,253 @@
-from openai import OpenAI
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from config.settings import loaded_config
+from utils.vector_db.chunking import TokenChunker, chunk_tokens, encode_text, get_encoding, split_segments
+from utils.vector_db.embedding_cache import EmbeddingCache, embedding_cache
 from utils.vector_db.exceptions import SearchError
-from typing import List, Tuple
-import tiktoken
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 
 class EmbeddingGenerator:
-    def __init__(self, api_key: str):
+    EMBEDDING_MODEL = "text-embedding-ada-002"
+    # Provider limits for one embeddings request: number of inputs and total tokens across them
+    MAX_BATCH_INPUTS = 2048
+    MAX_BATCH_TOKENS = 300000
+    # Chunks handed to one embedding task while the rest of the document is still being chunked
+    PIPELINE_BATCH_SIZE = 64
+    # Size of the pieces a large document is cut into for tokenizing in the process pool
+    PARALLEL_SEGMENT_CHARS = 200000
+
+    def __init__(self, api_key: str, cache: EmbeddingCache = embedding_cache):
         self.client = OpenAI(api_key=api_key)
         self.token_limit = 8000
+        self.chunk_overlap = int(loaded_config.embedding_chunk_overlap)
+        self.parallel_chunking_min_chars = int(loaded_config.embedding_parallel_chunking_min_chars)
+        self.cache = cache
+        max_concurrency = int(loaded_config.embedding_max_concurrency)
+        # Pooled async client: keep-alive connections are reused across requests instead of a thread per call
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            max_retries=int(loaded_config.embedding_max_retries),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+                timeout=httpx.Timeout(float(loaded_config.embedding_request_timeout),
+                                      connect=float(loaded_config.embedding_connect_timeout))
+            )
+        )
+        self._request_slots = asyncio.Semaphore(max_concurrency)
+        # Cache lookups (SQLite) and token counting run here rather than on the event loop or the default executor
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="embedding-cache")
 
     def generate_embedding(self, text: str):
+        cached = self.cache.get_many(self.EMBEDDING_MODEL, [text])[0]
+        if cached is not None:
+            return cached
         try:
-            response = self.client.embeddings.create(input=[text], model="text-embedding-ada-002")
-            return response.data[0].embedding  # Access as an attribute, not as a dictionary
+            response = self.client.embeddings.create(input=[text], model=self.EMBEDDING_MODEL)
+            embedding = response.data[0].embedding  # Access as an attribute, not as a dictionary
         except Exception as e:
             raise SearchError(f"Failed to generate embedding: {str(e)}")
+        self.cache.set_many(self.EMBEDDING_MODEL, [text], [embedding])
+        return embedding
+
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds many texts with as few requests as the provider limits allow.
+        - Texts already in the embedding cache are not sent; repeated texts are sent once.
+        - Packs the rest into a request until MAX_BATCH_INPUTS or MAX_BATCH_TOKENS is reached.
+        - Returns one embedding per text, in the order of `texts`.
+        """
+        embeddings = self.cache.get_many(self.EMBEDDING_MODEL, texts)
+        missing_texts = self._missing_texts(texts, embeddings)
+        if not missing_texts:
+            return embeddings
+
+        generated = []
+        try:
+            for batch in self._pack_batches(missing_texts):
+                response = self.client.embeddings.create(input=batch, model=self.EMBEDDING_MODEL)
+                generated.extend(self._ordered_embeddings(response))
+        except Exception as e:
+            raise SearchError(f"Failed to generate embeddings: {str(e)}")
+        self.cache.set_many(self.EMBEDDING_MODEL, missing_texts, generated)
+        return self._merge_generated(texts, embeddings, missing_texts, generated)
+
+    async def generate_embedding_async(self, text: str) -> List[float]:
+        return (await self.generate_embeddings_async([text]))[0]
+
+    async def generate_embeddings_async(self, texts: List[str]) -> List[List[float]]:
+        """
+        Async counterpart of generate_embeddings; never blocks the event loop.
+        - Batches are sent concurrently, at most `embedding_max_concurrency` requests in flight per generator.
+        """
+        embeddings = await self._run_in_executor(self.cache.get_many, self.EMBEDDING_MODEL, texts)
+        missing_texts = self._missing_texts(texts, embeddings)
+        if not missing_texts:
+            return embeddings
+
+        batches = await self._run_in_executor(lambda: list(self._pack_batches(missing_texts)))
+        try:
+            batch_embeddings = await asyncio.gather(*(self._create_embeddings_async(batch) for batch in batches))
+        except Exception as e:
+            raise SearchError(f"Failed to generate embeddings: {str(e)}")
+        generated = [embedding for batch in batch_embeddings for embedding in batch]
+        await self._run_in_executor(self.cache.set_many, self.EMBEDDING_MODEL, missing_texts, generated)
+        return self._merge_generated(texts, embeddings, missing_texts, generated)
+
+    async def close(self):
+        await self.async_client.close()
+        self._executor.shutdown(wait=False)
+        shutdown_chunking_pool()
+
+    async def _create_embeddings_async(self, batch: List[str]) -> List[List[float]]:
+        async with self._request_slots:
+            response = await self.async_client.embeddings.create(input=batch, model=self.EMBEDDING_MODEL)
+        return self._ordered_embeddings(response)
+
+    async def _run_in_executor(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    def _ordered_embeddings(response) -> List[List[float]]:
+        # The API tags every result with the position of its input; do not rely on response order
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    @staticmethod
+    def _missing_texts(texts: List[str], embeddings: List[Optional[List[float]]]) -> List[str]:
+        return list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+
+    @staticmethod
+    def _merge_generated(texts, embeddings, missing_texts, generated) -> List[List[float]]:
+        generated_by_text = dict(zip(missing_texts, generated))
+        return [embedding if embedding is not None else generated_by_text[text]
+                for text, embedding in zip(texts, embeddings)]
+
+    def _pack_batches(self, texts: List[str]) -> Iterator[List[str]]:
+        batch = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = self.count_tokens(text)
+            if batch and (len(batch) == self.MAX_BATCH_INPUTS or batch_tokens + tokens > self.MAX_BATCH_TOKENS):
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            yield batch
 
     def count_tokens(self, text: str) -> int:
         """Counts the number of tokens in a given text using OpenAI's tokenizer."""
-        encoding = tiktoken.get_encoding("cl100k_base")  # Tokenizer initialized here
-        return len(encoding.encode(text))
+        return len(get_encoding().encode(text))
 
     def chunk_text(self, text: str) -> List[str]:
         """
         Splits text into chunks ensuring each chunk stays within the token limit.
         - Uses OpenAI's tokenizer for accurate token calculation.
-        - Breaks text dynamically to stay within **8000 tokens** per chunk.
+        - Breaks text dynamically to stay within **8000 tokens** per chunk, overlapping by `chunk_overlap` tokens.
         """
-        encoding = tiktoken.get_encoding("cl100k_base")  # Tokenizer initialized here
-        tokens = encoding.encode(text)  # Convert text to token IDs
-        chunks = []
-        start = 0
+        return chunk_tokens(text, self.token_limit, self.chunk_overlap)
 
-        while start < len(tokens):
-            end = min(start + self.token_limit, len(tokens))
-            chunk_text = encoding.decode(tokens[start:end])  # Convert back to text
-            chunks.append(chunk_text)
-            start = end
+    async def iter_chunks(self, text: str) -> AsyncIterator[str]:
+        """
+        Yields the chunks of `text` as soon as they are available.
+        - Documents over `embedding_parallel_chunking_min_chars` are cut on line boundaries and tokenized
+          in the chunking process pool. Their tokens are chunked as one stream, in document order as
+          segments finish, so chunks and overlaps run across segment boundaries as for a small document.
+        - Smaller documents are chunked on the generator's executor.
+        """
+        if len(text) < self.parallel_chunking_min_chars:
+            for chunk in await self._run_in_executor(chunk_tokens, text, self.token_limit, self.chunk_overlap):
+                yield chunk
+            return
 
-        return chunks
+        loop = asyncio.get_running_loop()
+        chunker = TokenChunker(self.token_limit, self.chunk_overlap)
+        segments = [
+            loop.run_in_executor(get_chunking_pool(), encode_text, segment)
+            for segment in split_segments(text, self.PARALLEL_SEGMENT_CHARS)
+        ]
+        try:
+            for segment in segments:
+                for chunk in chunker.feed(await segment):
+                    yield chunk
+            for chunk in chunker.finish():
+                yield chunk
+        finally:
+            for segment in segments:
+                segment.cancel()
 
     async def process_xml_content(self, xml_content: str) -> List[Tuple[List[float], int, bool]]:
         """
         Processes XML content, ensuring it stays within the token limit before embedding.
+        - Chunks stream into embedding tasks of PIPELINE_BATCH_SIZE, so embedding overlaps with chunking.
         Returns:
         - A list of tuples (embedding, rank, is_chunked)
         """
-        if self.count_tokens(xml_content) <= self.token_limit:
-            embedding = self.generate_embedding(xml_content)
-            return [(embedding, 1, False)]  # Single chunk, no splitting
+        embedding_tasks = []
+        batch = []
+        try:
+            async for chunk in self.iter_chunks(xml_content):
+                batch.append(chunk)
+                if len(batch) == self.PIPELINE_BATCH_SIZE:
+                    embedding_tasks.append(asyncio.ensure_future(self.generate_embeddings_async(batch)))
+                    batch = []
+            if batch:
+                embedding_tasks.append(asyncio.ensure_future(self.generate_embeddings_async(batch)))
+            batch_embeddings = await asyncio.gather(*embedding_tasks)
+        except BaseException:
+            for task in embedding_tasks:
+                task.cancel()
+            raise
+
+        embeddings = [embedding for batch_embedding in batch_embeddings for embedding in batch_embedding]
+        if len(embeddings) == 1:
+            return [(embeddings[0], 1, False)]  # Single chunk, no splitting
+        return [(embedding, i + 1, True) for i, embedding in enumerate(embeddings)]
+
+
+_chunking_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_chunking_pool() -> ProcessPoolExecutor:
+    """
+    Process pool tokenizing large documents, created on first use.
+    Workers are spawned rather than forked, so they do not inherit the event loop, connections or
+    locks of the server process.
+    """
+    global _chunking_pool
+    if _chunking_pool is None:
+        _chunking_pool = ProcessPoolExecutor(
+            max_workers=int(loaded_config.embedding_chunking_workers),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _chunking_pool
+
+
+def shutdown_chunking_pool():
+    global _chunking_pool
+    if _chunking_pool is not None:
+        _chunking_pool.shutdown(wait=False, cancel_futures=True)
+        _chunking_pool = None
+
+
+_embedding_generator: Optional[EmbeddingGenerator] = None
+
+
+def get_embedding_generator() -> EmbeddingGenerator:
+    """Process-wide generator, so every adapter shares one connection pool and one concurrency limit."""
+    global _embedding_generator
+    if _embedding_generator is None:
+        _embedding_generator = EmbeddingGenerator(api_key=loaded_config.openai_gpt4o_api_key)
+    return _embedding_generator
+
 
-        # If content exceeds limit, split into token-based chunks
-        chunks = self.chunk_text(xml_content)
-        embeddings = [(self.generate_embedding(chunk), i + 1, True) for i, chunk in enumerate(chunks)]
-        return embeddings
\ No newline at end of file
+async def close_embedding_generator():
+    global _embedding_generator
+    if _embedding_generator is not None:
+        await _embedding_generator.close()
+        _embedding_generator = None
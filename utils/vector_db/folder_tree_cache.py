@@ -0,0 +1,176 @@
+import itertools
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config.settings import loaded_config
+from prometheus.metrics import FOLDER_TREE_CACHE_HITS, FOLDER_TREE_CACHE_MISSES
+
+CacheKey = Tuple[str, str]
+
+_versions = itertools.count(1)
+
+
+def build_folder_tree(file_paths: Iterable[str]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Full-depth folder tree of absolute file paths, relative to their common base path.
+    Returns (base path, tree); folders are dicts and files map to their full path.
+    """
+    file_paths = list(file_paths)
+    root = os.path.commonpath(file_paths)
+    tree = {}
+    for file_path in file_paths:
+        _insert_path(tree, root, file_path)
+    return root, tree
+
+
+def slice_folder_tree(tree: Dict[str, Any], level: int) -> Dict[str, Any]:
+    """Copy of `tree` down to `level` (0 keeps only the top level); deeper folders are left empty."""
+    return {
+        name: (slice_folder_tree(child, level - 1) if level > 0 else {}) if isinstance(child, dict) else child
+        for name, child in tree.items()
+    }
+
+
+def _insert_path(tree: Dict[str, Any], root: str, file_path: str):
+    parts = os.path.relpath(file_path, root).split(os.sep)
+    current = tree
+    for i, part in enumerate(parts):
+        # The last part is a file when it has an extension, otherwise a folder
+        if i == len(parts) - 1 and "." in part:
+            current[part] = file_path
+        else:
+            current = current.setdefault(part, {})
+
+
+class FolderTreeSnapshot:
+    """
+    File paths of one graph and the folder tree built from them.
+
+    The full-depth tree is built at most once per version and every `level` is sliced from it.
+    Added files are inserted into the built tree in place while they fall under its base path;
+    removals and files outside it drop the tree, which is then rebuilt from `paths` on the next
+    read without going back to the index. Trees handed out are shared: treat them as read-only.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths = set(paths)
+        self.version = next(_versions)
+        self._root: Optional[str] = None
+        self._tree: Optional[Dict[str, Any]] = None
+        self._slices: Dict[int, Dict[str, Any]] = {}
+
+    def tree(self, level: Optional[int] = None) -> Dict[str, Any]:
+        if self._tree is None:
+            self._root, self._tree = build_folder_tree(sorted(self.paths))
+        if level is None:
+            return self._tree
+        if level not in self._slices:
+            self._slices[level] = slice_folder_tree(self._tree, level)
+        return self._slices[level]
+
+    def add_paths(self, paths: Iterable[str]):
+        added = [path for path in paths if path not in self.paths]
+        if not added:
+            return
+        self.paths.update(added)
+        self._changed()
+        if self._tree is None:
+            return
+        # A tree with a single top-level entry, or a file outside the base path, moves the base path
+        if len(self._tree) < 2 or any(not path.startswith(self._root + os.sep) for path in added):
+            self._tree = None
+            return
+        for path in added:
+            _insert_path(self._tree, self._root, path)
+
+    def remove_prefix(self, prefix: str):
+        removed = {path for path in self.paths if path.startswith(prefix)}
+        if not removed:
+            return
+        self.paths -= removed
+        self._changed()
+        self._tree = None
+
+    def _changed(self):
+        self.version = next(_versions)
+        self._slices.clear()
+
+
+class FolderTreeCache:
+    """
+    In-process LRU cache of folder tree snapshots keyed by (index name, graph id).
+
+    Snapshots are loaded lazily on the first read and kept current by the adapter's write paths;
+    entries also expire after `ttl` seconds so writes handled by other workers become visible.
+    A load that raced with a write is served but not cached, so it cannot resurrect stale paths.
+    """
+
+    def __init__(self, max_graphs: int, ttl: int, enabled: bool = True):
+        self.max_graphs = max_graphs
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[CacheKey, Tuple[float, FolderTreeSnapshot]]" = OrderedDict()
+        self.write_sequence = 0
+
+    def get(self, index_name: str, graph_id: str) -> Optional[FolderTreeSnapshot]:
+        if not self.enabled:
+            return None
+
+        key = (index_name, graph_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            FOLDER_TREE_CACHE_MISSES.inc()
+            return None
+
+        self._entries.move_to_end(key)
+        FOLDER_TREE_CACHE_HITS.inc()
+        return entry[1]
+
+    def set(self, index_name: str, graph_id: str, paths: List[str], loaded_at: int) -> FolderTreeSnapshot:
+        """Caches the paths loaded when `write_sequence` was `loaded_at`; returns their snapshot either way."""
+        snapshot = FolderTreeSnapshot(paths)
+        if not self.enabled or loaded_at != self.write_sequence:
+            return snapshot
+
+        key = (index_name, graph_id)
+        self._entries[key] = (time.monotonic() + self.ttl, snapshot)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_graphs:
+            self._entries.popitem(last=False)
+        return snapshot
+
+    def add_paths(self, index_name: str, graph_id: str, paths: List[str]):
+        self.write_sequence += 1
+        entry = self._entries.get((index_name, graph_id))
+        if entry is not None:
+            entry[1].add_paths(paths)
+
+    def remove_prefix(self, index_name: str, graph_id: str, prefix: str):
+        self.write_sequence += 1
+        entry = self._entries.get((index_name, graph_id))
+        if entry is not None:
+            entry[1].remove_prefix(prefix)
+
+    def invalidate_graph(self, index_name: str, graph_id: str):
+        self.write_sequence += 1
+        self._entries.pop((index_name, graph_id), None)
+
+    def invalidate_index(self, index_name: str):
+        self.write_sequence += 1
+        for key in [key for key in self._entries if key[0] == index_name]:
+            del self._entries[key]
+
+    def clear(self):
+        self.write_sequence += 1
+        self._entries.clear()
+
+
+folder_tree_cache = FolderTreeCache(
+    max_graphs=loaded_config.folder_tree_cache_max_graphs,
+    ttl=loaded_config.folder_tree_cache_ttl,
+    enabled=loaded_config.folder_tree_cache_enabled
+)